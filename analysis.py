@@ -1,162 +1,382 @@
+import os
+import time
+from functools import lru_cache, reduce
+
+import numpy as np
 import pandas as pd
 import yfinance as yf
-from datetime import timedelta
 
 from tqdm import tqdm
 from datetime import datetime
 import pytz  # Import for timezone handling
 
 import csv
-from yahooquery import Ticker
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional; fall back to plain Python
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
 
 
 # Set timeout globally (e.g., 10 seconds)
 
+# Holding period for returns (2 or 5 years), kept as NumPy timedeltas so date
+# arithmetic on datetime64 / int64-ns arrays never boxes pandas Timestamps
+HOLD_PERIOD = np.timedelta64(365*5, 'D')
+HOLD_PERIOD_NS = HOLD_PERIOD // np.timedelta64(1, 'ns')
+
+# SPY history is cached on disk so reruns over the same window skip the network
+SPY_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+SPY_CACHE_TTL = 90 * 86400  # seconds
+
+
+@lru_cache(maxsize=16)
+def _spy_history(sd_iso, ed_iso):
+    path = os.path.join(SPY_CACHE_DIR, f"spy_{sd_iso[:10]}_{ed_iso[:10]}.pkl")
+    if os.path.exists(path) and time.time() - os.path.getmtime(path) < SPY_CACHE_TTL:
+        return pd.read_pickle(path)
+
+    spy_data = yf.Ticker("SPY").history(
+        start=datetime.fromisoformat(sd_iso),
+        end=datetime.fromisoformat(ed_iso),
+    )
+    if not spy_data.empty:
+        os.makedirs(SPY_CACHE_DIR, exist_ok=True)
+        spy_data.to_pickle(path)
+    return spy_data
+
+
+def get_spy_history(sd, ed):
+    """SPY daily history for [sd, ed), memoized in-process and on disk."""
+    # isoformat strings are hashable keys for lru_cache; hand back a copy so
+    # callers can add columns without touching the cached frame
+    return _spy_history(sd.isoformat(), ed.isoformat()).copy()
+
+
+DEFAULT_PROFILE = ("Unknown", 0, 0)
+
+
+def _parse_profile(row):
+    industry = row[1]
+    # Handle "N/A" in dividend yield / volume by falling back to 0
+    try:
+        dividend_yield = float(row[2])
+    except ValueError:
+        return industry, 0, 0
+    try:
+        vol = int(row[3])
+    except ValueError:
+        return industry, dividend_yield, 0
+    return industry, dividend_yield, vol
+
+
+def _read_profiles(path="fixedUp.csv"):
+    """Read every ticker's (industry, dividend_yield, volume) in one pass."""
+    profiles = {}
+    try:
+        with open(path, mode='r') as file:
+            for row in csv.reader(file):
+                if row:
+                    profiles[row[0]] = _parse_profile(row)
+    except Exception as e:
+        print(f"Error reading CSV: {e}")
+    return profiles
+
 
-def calculate_confidence_score(ticker: str, percentage_change: float, ranking: int) -> float:
+# Loaded once at import; scoring is then an O(1) dict lookup per ticker
+_PROFILE = _read_profiles()
+
+# The same profiles as parallel arrays indexed by ticker id, for scoring a
+# batch of tickers in one vectorized pass. The extra last row holds
+# DEFAULT_PROFILE for tickers missing from the CSV.
+TICKER_IDS = {ticker: i for i, ticker in enumerate(_PROFILE)}
+_DEFAULT_ID = len(TICKER_IDS)
+_profiles = list(_PROFILE.values()) + [DEFAULT_PROFILE]
+IS_TECH_HC = np.array(["technology" in p[0] or "healthcare" in p[0] for p in _profiles], dtype=bool)
+IS_REIT = np.array(["reit" in p[0] for p in _profiles], dtype=bool)
+DIV_YIELD = np.array([p[1] for p in _profiles], dtype=np.float32)
+VOLUME = np.array([p[2] for p in _profiles], dtype=np.int64)
+del _profiles
+
+
+# Define weights
+#weights #1
+WEIGHTS = {
+    "industry": 15,
+    "dividends": 15,
+    "reit": 10,
+    "severity_of_loss": 30,
+    "ranking": 10,
+    "volume": 20
+}
+
+# WEIGHTS = {
+#     "industry": 25,
+#     "dividends": 25,
+#     "reit": 10,
+#     "severity_of_loss": 20,
+#     "ranking": 10,
+#     "volume": 10
+# }
+
+# Minimum confidence score for a loser to be picked
+CONFIDENCE_THRESHOLD = 80
+
+
+@njit(cache=True)
+def _score_components(is_tech_hc, is_reit, dividend_yield, vol, percentage_change, ranking,
+                      w_industry, w_dividends, w_reit, w_severity, w_ranking, w_volume):
+    # Calculate score components
+    score = 0.0
+
+    # Industry: Is it a technology or innovative healthcare company?
+    if is_tech_hc:
+        score += w_industry
+
+    # Dividend Yield: Is the dividend yield less than 1%?
+    if dividend_yield < 1:
+        score += w_dividends
+
+    # REIT: Is it not a REIT stock?
+    if not is_reit:
+        score += w_reit
+
+    #Severity of Loss: Did the stock lose more than 5%?
+    if percentage_change < -5:  # Assuming percentage_change is negative for losses
+        score += w_severity
+    else:
+        score += w_severity*((100-(5+percentage_change)*20)/100)
+    #Volume: Is the stock volume greater than 30000000?
+    if vol > 30000000:
+        score += w_volume
+
+    # Ranking: Based on position in biggest loser hierarchy
+    ranking_score = max(w_ranking - (ranking - 1) * (w_ranking/5), 0)  # 10% for #1, 8% for #2, etc.
+    score += ranking_score
+
+    # Return the confidence score
+    return score
+
+
+def calculate_confidence_score(ticker: str, percentage_change: float, ranking: int, profile=None) -> float:
     """
     Calculate a confidence score for a stock based on various factors.
+
+    profile is the (industry, dividend_yield, volume) tuple for the ticker;
+    it is looked up in the preloaded fixedUp.csv table when not supplied.
     
     Returns:
         float: The confidence score between 0 and 100.
     """
     try:
-        industry ="Unknown"
-        dividend_yield = 0
-        vol = 0
-        try:
-            with open("fixedUp.csv", mode='r') as file:
-                reader = csv.reader(file)
-                for row in reader:
-                    if row[0] == ticker:  # Match ticker
-                        industry = row[1]
-                        # Handle "N/A" in dividend yield and convert to float
-                        dividend_yield = float(row[2]) 
-                        vol = int(row[3]) 
-            
-                        if dividend_yield == "N/A":
-                            dividend_yield = 0.0
-                        
-                        
+        if profile is None:
             # If ticker not found in the CSV
-        except Exception as e:
-            print(f"Error reading CSV: {e}")
-
-        # Define weights
-        #weights #1
-        weights = {
-            "industry": 15,
-            "dividends": 15,
-            "reit": 10,
-            "severity_of_loss": 30,
-            "ranking": 10,
-            "volume": 20
-        }
-
-        # weights = {
-        #     "industry": 25,
-        #     "dividends": 25,
-        #     "reit": 10,
-        #     "severity_of_loss": 20,
-        #     "ranking": 10,
-        #     "volume": 10
-        # }
-        
-        # Calculate score components
-        score = 0
+            profile = _PROFILE.get(ticker, DEFAULT_PROFILE)
+        industry, dividend_yield, vol = profile
 
         # Industry: Is it a technology or innovative healthcare company?
-        if "technology" in industry or "healthcare" in industry:
-            score += weights["industry"]
-
-        # Dividend Yield: Is the dividend yield less than 1%?
-        if dividend_yield < 1:
-            score += weights["dividends"]
-
-        # REIT: Is it not a REIT stock?
-        if "reit" not in industry:
-            score += weights["reit"]
-
-        #Severity of Loss: Did the stock lose more than 5%?
-        if percentage_change < -5:  # Assuming percentage_change is negative for losses
-            score += weights["severity_of_loss"]
-        else:
-            score += weights["severity_of_loss"]*((100-(5+percentage_change)*20)/100)
-        #Volume: Is the stock volume greater than 30000000?
-        if vol > 30000000:
-            score += weights["volume"]
-
-        # Ranking: Based on position in biggest loser hierarchy
-        ranking_score = max(weights["ranking"] - (ranking - 1) * (weights["ranking"]/5), 0)  # 10% for #1, 8% for #2, etc.
-        score += ranking_score
-
-        # Return the confidence score
-        return score
+        is_tech_hc = "technology" in industry or "healthcare" in industry
+        # REIT: Is it a REIT stock?
+        is_reit = "reit" in industry
+
+        return _score_components(
+            is_tech_hc, is_reit, dividend_yield, vol, percentage_change, ranking,
+            WEIGHTS["industry"], WEIGHTS["dividends"], WEIGHTS["reit"],
+            WEIGHTS["severity_of_loss"], WEIGHTS["ranking"], WEIGHTS["volume"],
+        )
     
     except Exception as e:
         print(f"Error calculating confidence score for {ticker}: {e}")
         return 0.0
 
-def get_biggest_losers(data, date):
-    daily_changes = {}
-    percentage_change = 0
-    for symbol, df in data.items():
-        if date in df.index:
-            close_price = df.loc[date, 'Close']
-            open_price = df.loc[date, 'Open']
-            percentage_change = (close_price - open_price) / open_price * 100
-            daily_changes[symbol] = percentage_change
-            
-            
-    losers = sorted(daily_changes, key=daily_changes.get)[:5]
-    rank = 1
-    
-    temp = losers
-    storevalues = []
-    for loser in temp:
-        
-        confidence_score = calculate_confidence_score(loser, daily_changes[loser], rank)
-        
-        rank = rank + 1
-        
-        if(confidence_score < 80):
-
-            storevalues.append(loser)
-                
-        
-    for s in storevalues:
-        losers.remove(s)
+def calculate_confidence_scores(tickers, percentage_changes, rankings, threshold=None):
+    """
+    Vectorized calculate_confidence_score for a batch of tickers, using the
+    preloaded profile arrays instead of one lookup per ticker.
+
+    With a threshold, the loss-based components (already in hand) are scored
+    first and tickers that cannot reach the threshold even with every
+    profile bonus skip the profile lookups; their partial score is returned.
+    """
+    pct = np.asarray(percentage_changes, dtype=np.float32)
+    rank = np.asarray(rankings, dtype=np.float32)
+    w = WEIGHTS
+
+    # Severity of loss and ranking only need the day's numbers
+    severity = np.where(
+        pct < -5,
+        w["severity_of_loss"],
+        w["severity_of_loss"] * ((100 - (5 + pct) * 20) / 100),
+    )
+    ranking_score = np.maximum(w["ranking"] - (rank - 1) * (w["ranking"] / 5), 0)
+    scores = severity + ranking_score
+
+    reachable = np.ones(len(scores), dtype=bool)
+    if threshold is not None:
+        profile_max = w["industry"] + w["dividends"] + w["reit"] + w["volume"]
+        reachable = scores + profile_max >= threshold
+        if not reachable.any():
+            return scores
+
+    ids = np.array(
+        [TICKER_IDS.get(t, _DEFAULT_ID) for t, keep in zip(tickers, reachable) if keep],
+        dtype=np.intp,
+    )
+    scores[reachable] += (
+        IS_TECH_HC[ids] * w["industry"]
+        + (DIV_YIELD[ids] < 1) * w["dividends"]
+        + ~IS_REIT[ids] * w["reit"]
+        + (VOLUME[ids] > 30000000) * w["volume"]
+    )
+    return scores
+
+# Field axis of the price panel
+OPEN, CLOSE = 0, 1
+
+
+def build_price_panel(data):
+    """
+    Pack every symbol's Open/Close into one float32 array
+    prices[date_i, symbol_i, field] on a shared date axis, so a whole trading
+    day is a single contiguous slice instead of one .loc lookup per symbol.
+
+    Also keeps each symbol's own (close, open, index) as plain NumPy arrays so
+    calculate_return can work with searchsorted instead of .loc.
+    """
+    symbols = list(data)
+    dates = reduce(lambda a, b: a.union(b), (df.index for df in data.values()))
+
+    # float32 is plenty for prices and halves the bytes swept per pass
+    prices = np.full((len(dates), len(symbols), 2), np.nan, dtype=np.float32)
+    for symbol_i, df in enumerate(data.values()):
+        date_i = dates.get_indexer(df.index)
+        prices[date_i, symbol_i, OPEN] = df['Open'].to_numpy(dtype=np.float32)
+        prices[date_i, symbol_i, CLOSE] = df['Close'].to_numpy(dtype=np.float32)
+
+    arrays = {
+        symbol: (
+            df['Close'].to_numpy(dtype=np.float32),
+            df['Open'].to_numpy(dtype=np.float32),
+            df.index.values.astype('datetime64[ns]'),
+        )
+        for symbol, df in data.items()
+    }
+    return {
+        'symbols': symbols,
+        'symbol_ids': {symbol: i for i, symbol in enumerate(symbols)},
+        'dates': dates,
+        'prices': prices,
+        'arrays': arrays,
+        # Last available date per symbol, looked up once here rather than
+        # re-read from the index on every calculate_return call
+        'last_dates': {symbol: idx_ns[-1] for symbol, (_, _, idx_ns) in arrays.items()},
+    }
+
+def get_biggest_losers(panel, date, k=5):
+    if date not in panel['dates']:
+        return [], 0
+
+    day = panel['prices'][panel['dates'].get_loc(date)]
+    pct = (day[:, CLOSE] - day[:, OPEN]) / day[:, OPEN] * np.float32(100.0)
+
+    # Symbols without a bar on this date are NaN in the aligned panel
+    available = np.flatnonzero(~np.isnan(pct))
+    if available.size == 0:
+        return [], 0
+    k = min(k, available.size)
+    pct_available = pct[available]
+
+    # O(N) partition for the k smallest, then order just those k
+    top = np.argpartition(pct_available, k - 1)[:k]
+    top = available[top[np.argsort(pct_available[top])]]
+
+    candidates = [panel['symbols'][i] for i in top]
+    scores = calculate_confidence_scores(
+        candidates, pct[top], np.arange(1, k + 1), threshold=CONFIDENCE_THRESHOLD
+    )
+    losers = [loser for loser, score in zip(candidates, scores) if score >= CONFIDENCE_THRESHOLD]
+
     # print(losers)
-    return losers, percentage_change
+    return losers, pct[top[0]]
 
-def calculate_return(data, symbol, start_date, pc):
-    try:
-        # Get the start price
-
-        start_price = data[symbol].loc[start_date, 'Close']
-        
-        
-        # Calculate target end date (2 or 5 years after start_date)
-        target_end_date = start_date + timedelta(days=365*5)
-        
-        # Ensure the target end date is within the available data range
-        max_end_date = data[symbol].index[-1]  # Last available date in the dataset
-        target_end_date = min(target_end_date, max_end_date)
-        
-        # Find the nearest valid trading day
-        valid_dates = data[symbol].index
-        if target_end_date not in valid_dates:
-            # Use the closest trading day (before the target date)
-            target_end_date = valid_dates[valid_dates.get_indexer([target_end_date], method='nearest')[0]]
-        
-        # Get the end price
-        end_price = data[symbol].loc[target_end_date, 'Close']
-        
-        # Calculate return
-        return (end_price - start_price) / start_price * 100
-    except Exception as e:
-        print(f"Error for {symbol} on {start_date}: {e}")
-        return None  # Handle missing or invalid data
+@njit(cache=True)
+def _compute_return(close, idx_ns, start_i, horizon_ns, max_end_ns):
+    # Calculate target end date (2 or 5 years after start_date)
+    # Ensure the target end date is within the available data range
+    target_ns = min(idx_ns[start_i] + horizon_ns, max_end_ns)
+
+    # Find the nearest valid trading day (ties go to the later day,
+    # matching DatetimeIndex.get_indexer(method='nearest'))
+    j = np.searchsorted(idx_ns, target_ns)
+    if idx_ns[j] != target_ns and target_ns - idx_ns[j - 1] < idx_ns[j] - target_ns:
+        j -= 1
+
+    # Calculate return in float64 so averages over many picks don't drift
+    start_price = np.float64(close[start_i])
+    return (np.float64(close[j]) - start_price) / start_price * 100
+
+def calculate_return(panel, symbol, start_date, pc):
+    # Missing data is checked up front so the hot path never raises
+    arrays = panel['arrays'].get(symbol)
+    if arrays is None:
+        print(f"Error for {symbol} on {start_date}: no price data")
+        return None
+
+    close, _, idx_ns = arrays
+    # int64 nanoseconds keep the compiled kernel in nopython mode
+    idx_ns = idx_ns.view(np.int64)
+    start_ns = pd.Timestamp(start_date).value
+
+    # Get the start price
+    i = np.searchsorted(idx_ns, start_ns)
+    if i == len(idx_ns) or idx_ns[i] != start_ns:
+        print(f"Error for {symbol} on {start_date}: no price on start date")
+        return None
+
+    max_end_ns = panel['last_dates'][symbol].view(np.int64)  # Last available date in the dataset
+    return _compute_return(close, idx_ns, i, HOLD_PERIOD_NS, max_end_ns)
+
+def calculate_returns(panel, symbol, start_dates):
+    """
+    Batched calculate_return: holding-period returns for many start dates of
+    one symbol, with one searchsorted for the start bars and one for the
+    nearest end bars. Start dates without a bar come back as NaN.
+    """
+    returns = np.full(len(start_dates), np.nan)
+    arrays = panel['arrays'].get(symbol)
+    if arrays is None:
+        print(f"Error for {symbol}: no price data")
+        return returns
+
+    close, _, idx_ns = arrays
+    idx_ns = idx_ns.view(np.int64)
+    start_ns = pd.DatetimeIndex(start_dates).as_unit('ns').asi8
+
+    # Get the start prices
+    i = np.searchsorted(idx_ns, start_ns)
+    found = i < len(idx_ns)
+    found[found] = idx_ns[i[found]] == start_ns[found]
+    if not found.all():
+        print(f"Error for {symbol}: no price on {(~found).sum()} start date(s)")
+    i = i[found]
+
+    # Target end dates, capped at the last available date
+    max_end_ns = panel['last_dates'][symbol].view(np.int64)
+    target_ns = np.minimum(idx_ns[i] + HOLD_PERIOD_NS, max_end_ns)
+
+    # Nearest trading day to each target: the bar at or after it, or the one
+    # before when that is strictly closer (same tie-break as get_indexer)
+    j = np.searchsorted(idx_ns, target_ns)
+    before = np.maximum(j - 1, 0)
+    use_before = (idx_ns[j] != target_ns) & (target_ns - idx_ns[before] < idx_ns[j] - target_ns)
+    j = np.where(use_before, before, j)
+
+    start_price = close[i].astype(np.float64)
+    returns[found] = (close[j].astype(np.float64) - start_price) / start_price * 100
+    return returns
 
 def analyze_results(df_results, sd, ed):
     # 
@@ -184,21 +404,19 @@ def analyze_results(df_results, sd, ed):
     print("\n=== SPY Rolling 2-Year Returns ===")
     ## As of now SPY working is dependent on 
     try:
-        spy = yf.Ticker("SPY")
-        spy_data = spy.history(start=sd, end=ed)  # Use the same time window
-        spy_data['2y_return'] = None  # Initialize column
-
-        # Calculate 2-year returns for each day
-        for i in range(len(spy_data)):
-            start_price = spy_data['Close'].iloc[i]
-            start_date = spy_data.index[i]
-            end_date = start_date + timedelta(days=365*5)
-
-            # Find the closest available date within the 2-year window
-            end_prices = spy_data[spy_data.index >= end_date]['Close']
-            if not end_prices.empty:
-                end_price = end_prices.iloc[0]
-                spy_data.at[start_date, '2y_return'] = (end_price - start_price) / start_price * 100
+        spy_data = get_spy_history(sd, ed)  # Use the same time window
+
+        # Calculate 2-year returns for each day: locate every window's end
+        # (first trading day on or after start + hold) with one searchsorted
+        idx_ns = spy_data.index.values.astype('datetime64[ns]')
+        target_ns = idx_ns + HOLD_PERIOD
+        end_pos = np.searchsorted(idx_ns, target_ns, side='left')
+        valid = end_pos < len(idx_ns)
+
+        close = spy_data['Close'].to_numpy(dtype=np.float64)
+        ret = np.full(len(idx_ns), np.nan)
+        ret[valid] = (close[end_pos[valid]] - close[valid]) / close[valid] * 100
+        spy_data['2y_return'] = ret
 
         # Filter out any days without a valid 2-year return
         valid_returns = spy_data['2y_return'].dropna()
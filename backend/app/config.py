@@ -10,6 +10,9 @@ PROJECT_ROOT = BASE_DIR.parent
 DATABASE_URL = f"sqlite+aiosqlite:///{DATA_DIR}/stocks.db"
 SYNC_DATABASE_URL = f"sqlite:///{DATA_DIR}/stocks.db"
 
+# Optional Redis for job progress shared across API workers (unset: in-process)
+REDIS_URL = os.environ.get("REDIS_URL")
+
 # Data files from original project
 SP500_TICKERS_FILE = PROJECT_ROOT / "SANDPNoRepeats.csv"
 STOCK_METADATA_FILE = PROJECT_ROOT / "fixedUp.csv"
@@ -1,32 +1,104 @@
+import orjson
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text
 from sqlalchemy.orm import sessionmaker
 
 from app.config import DATABASE_URL, SYNC_DATABASE_URL
 from app.db.models import Base
 
-# Async engine for FastAPI
-async_engine = create_async_engine(DATABASE_URL, echo=False)
+
+def _json_serializer(obj) -> str:
+    """
+    Encode JSON columns with orjson; formulas and analyses from training may
+    hold numpy scalars and int-keyed breakdowns.
+    """
+    return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS).decode()
+
+
+# Async engine for FastAPI request handlers; awaiting queries keeps the
+# event loop free while connections are checked out of the pool
+async_engine = create_async_engine(
+    DATABASE_URL,
+    echo=False,
+    json_serializer=_json_serializer,
+    json_deserializer=orjson.loads,
+    pool_size=20,
+    max_overflow=10,
+    pool_pre_ping=True
+)
 AsyncSessionLocal = async_sessionmaker(
     async_engine,
     class_=AsyncSession,
     expire_on_commit=False
 )
 
-# Sync engine for background tasks and data loading
-sync_engine = create_engine(SYNC_DATABASE_URL, echo=False)
-SyncSessionLocal = sessionmaker(bind=sync_engine)
+# Sync engine for background tasks, data loading and request sessions;
+# connections are pooled and reused across requests and threads
+sync_engine = create_engine(
+    SYNC_DATABASE_URL,
+    echo=False,
+    json_serializer=_json_serializer,
+    json_deserializer=orjson.loads,
+    pool_size=20,
+    max_overflow=10,
+    pool_timeout=30,
+    pool_pre_ping=True,
+    pool_recycle=3600,
+    connect_args={"check_same_thread": False}
+)
+SyncSessionLocal = sessionmaker(bind=sync_engine, autoflush=False)
+
+
+def _set_sqlite_pragmas(dbapi_conn, connection_record):
+    """
+    WAL lets the API read run status while a background analysis is writing;
+    synchronous=NORMAL skips the fsync on every commit (still safe under WAL).
+    """
+    cursor = dbapi_conn.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA mmap_size=268435456")
+    cursor.close()
+
+
+event.listen(sync_engine, "connect", _set_sqlite_pragmas)
+event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+
+
+def _upgrade_schema(conn):
+    """
+    create_all skips tables that already exist, so nullable columns and indexes
+    added to an existing table's model are created here.
+    """
+    inspector = inspect(conn)
+    for table in Base.metadata.tables.values():
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing and column.nullable:
+                column_type = column.type.compile(dialect=conn.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
 
 
 async def init_db():
-    """Create all database tables"""
+    """Create all database tables and indexes"""
     async with async_engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_upgrade_schema)
 
 
 def init_db_sync():
-    """Create all database tables (synchronous version)"""
+    """
+    Create all database tables (synchronous version).
+    For scripts outside the API; the app creates the schema once at startup
+    via init_db() in the lifespan, so request handlers must not call this.
+    """
     Base.metadata.create_all(bind=sync_engine)
+    with sync_engine.begin() as conn:
+        _upgrade_schema(conn)
 
 
 async def get_db():
@@ -39,9 +111,12 @@ async def get_db():
 
 
 def get_sync_db():
-    """Get synchronous database session"""
+    """
+    Dependency for getting a pooled synchronous database session.
+    Background tasks, which run outside a request, use SyncSessionLocal() directly.
+    """
     db = SyncSessionLocal()
     try:
-        return db
+        yield db
     finally:
         db.close()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, BigInteger, String, Float, Date, DateTime, ForeignKey, Index, JSON
 from sqlalchemy.orm import relationship, declarative_base
 from datetime import datetime
 
@@ -27,15 +27,23 @@ class AnalysisRun(Base):
     scoring_model_id = Column(Integer, ForeignKey("scoring_models.id"), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     completed_at = Column(DateTime, nullable=True)
+    # Pattern analysis and summary, stored on completion so results aren't recomputed
+    analysis_json = Column(JSON(none_as_null=True), nullable=True)
+    summary_json = Column(JSON(none_as_null=True), nullable=True)
 
     picks = relationship("StockPick", back_populates="run", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Run listings filter on run_type and sort newest first
+        Index("ix_analysis_runs_type_created", run_type, created_at.desc()),
+    )
+
 
 class StockPick(Base):
     __tablename__ = "stock_picks"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    run_id = Column(Integer, ForeignKey("analysis_runs.id"), nullable=False)
+    run_id = Column(Integer, ForeignKey("analysis_runs.id"), nullable=False, index=True)
     loser_date = Column(Date, nullable=False)  # Day stock was identified as loser
     purchase_date = Column(Date)  # Day after loser_date when we buy at open
     purchase_price = Column(Float)  # Open price on purchase_date
@@ -62,13 +70,14 @@ class ScoringModel(Base):
     training_run_id = Column(Integer, ForeignKey("analysis_runs.id"), nullable=True)
     # Full formula JSON with structure:
     # {"factor_name": {"weight": 25.5, "condition": "HAS"/"NOT", "category": "dividend", ...}, ...}
-    formula = Column(Text)
+    # JSON columns are TEXT in SQLite, so rows written as JSON strings read back as dicts
+    formula = Column(JSON(none_as_null=True))
     # Legacy weights field for backwards compatibility
-    weights = Column(Text)  # JSON string: {"industry": 15, "volume": 20, ...}
+    weights = Column(JSON(none_as_null=True))  # {"industry": 15, "volume": 20, ...}
     threshold = Column(Float, default=65.0)
     avg_return = Column(Float)
     win_rate = Column(Float)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
 
 
 class PriceCache(Base):
@@ -76,15 +85,30 @@ class PriceCache(Base):
     __tablename__ = "price_cache"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    ticker = Column(String, nullable=False, index=True)
+    ticker = Column(String, nullable=False)  # leading column of ix_pricecache_ticker_date
     date = Column(Date, nullable=False, index=True)
     open_price = Column(Float)
     high_price = Column(Float)
     low_price = Column(Float)
     close_price = Column(Float)
-    volume = Column(Integer)
+    volume = Column(BigInteger)
 
     __table_args__ = (
-        # Composite unique constraint
+        # Composite unique index: one row per ticker per day, and ticker + date
+        # range reads are an index range scan
+        Index("ix_pricecache_ticker_date", "ticker", "date", unique=True),
         {"sqlite_autoincrement": True},
     )
+
+
+class PriceCacheSpan(Base):
+    """
+    The window each ticker's price_cache rows were downloaded for, in one request.
+    A window is only served from the cache if it lies inside the ticker's span.
+    """
+    __tablename__ = "price_cache_spans"
+
+    ticker = Column(String, primary_key=True)
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date, nullable=False)  # exclusive, like yf.download's end
+    fetched_at = Column(DateTime, nullable=False, default=datetime.utcnow)
@@ -1,24 +1,44 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
+from anyio import to_thread
+from typing import Any
+import orjson
 
 from app.db.database import init_db
+from app.services.job_store import job_executor
 from app.routers import training, analysis, models, data
 
+THREADPOOL_SIZE = 30
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response encoded with orjson (C) instead of stdlib json"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: initialize database
+    # Startup: initialize database (the only place the schema is created;
+    # request handlers assume the tables exist)
     await init_db()
+    # Threadpool for sync handlers and run_in_threadpool calls, sized to the
+    # sync engine's connection pool (pool_size + max_overflow)
+    to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
     yield
-    # Shutdown: cleanup if needed
+    # Shutdown: drop queued jobs rather than blocking exit on long-running ones
+    job_executor.shutdown(wait=False, cancel_futures=True)
 
 
 app = FastAPI(
     title="Stock Analysis - Biggest Losers",
     description="Analyze S&P 500 biggest daily losers and their recovery patterns",
     version="2.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # CORS for frontend
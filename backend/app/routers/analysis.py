@@ -1,23 +1,67 @@
 """
 Analysis API endpoints for running backtests with a scoring model.
 """
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from datetime import datetime, date
 from typing import List, Optional, Dict, Any
 import csv
 import io
-
-from app.db.database import get_sync_db, init_db_sync
+import os
+import tempfile
+import msgpack
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.config import DATA_DIR
+from app.db.database import get_sync_db, SyncSessionLocal
 from app.db.models import AnalysisRun, ScoringModel
 from app.services.training import run_training_analysis
-from app.services.scoring import calculate_confidence_score, weights_from_json, DEFAULT_WEIGHTS
+from app.services.scoring import DEFAULT_WEIGHTS
+from app.services.scoring_jit import score_picks
+from app.services.job_store import JobStore, submit_job
 
 router = APIRouter()
 
-# In-memory storage for running jobs
-running_analysis_jobs: Dict[int, Dict[str, Any]] = {}
+# Status/progress for running jobs (Redis when configured, else in-memory);
+# completed results live on disk
+running_analysis_jobs = JobStore("analysis")
+
+# Bytes of CSV buffered before each streamed export chunk is sent
+CSV_CHUNK_SIZE = 64 * 1024
+
+
+def analysis_results_path(run_id: int):
+    """Where a completed run's results are stored"""
+    return DATA_DIR / f"analysis_{run_id}.mpk"
+
+
+def save_analysis_results(run_id: int, results: Dict[str, Any]):
+    """
+    Persist a run's results as a single msgpack blob. It is written to a
+    temporary file and renamed into place, so readers never see a partial one.
+    """
+    path = analysis_results_path(run_id)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(msgpack.packb(results, use_bin_type=True))
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def load_analysis_results(run_id: int) -> Optional[Dict[str, Any]]:
+    """Load a run's results, or None if it has none on disk"""
+    try:
+        with open(analysis_results_path(run_id), 'rb') as f:
+            # strict_map_key=False: the analysis breakdowns are keyed by ranking (int)
+            return msgpack.unpackb(f.read(), raw=False, strict_map_key=False)
+    except FileNotFoundError:
+        return None
 
 
 class AnalysisRequest(BaseModel):
@@ -37,55 +81,55 @@ class AnalysisStatusResponse(BaseModel):
 
 
 @router.post("/run", response_model=AnalysisStatusResponse)
-async def start_analysis(request: AnalysisRequest, background_tasks: BackgroundTasks):
+async def start_analysis(
+    request: AnalysisRequest,
+    db: Session = Depends(get_sync_db)
+):
     """
     Start a new analysis run with a specific scoring model.
     """
     # Get weights from model or request
     weights = request.weights or DEFAULT_WEIGHTS
 
+    # Blocking ORM calls run in the threadpool so they don't stall the event loop
     if request.scoring_model_id:
-        db = get_sync_db()
-        try:
-            model = db.query(ScoringModel).filter(ScoringModel.id == request.scoring_model_id).first()
-            if model:
-                weights = weights_from_json(model.weights)
-        finally:
-            db.close()
+        model = await run_in_threadpool(
+            lambda: db.query(ScoringModel).filter(ScoringModel.id == request.scoring_model_id).first()
+        )
+        if model:
+            weights = model.weights or DEFAULT_WEIGHTS.copy()
 
     # Create analysis run record
-    init_db_sync()
-    db = get_sync_db()
+    run = AnalysisRun(
+        start_date=request.start_date,
+        end_date=request.end_date,
+        hold_period_years=max(request.hold_years),
+        run_type='analysis',
+        status='pending',
+        progress=0.0,
+        scoring_model_id=request.scoring_model_id
+    )
 
-    try:
-        run = AnalysisRun(
-            start_date=request.start_date,
-            end_date=request.end_date,
-            hold_period_years=max(request.hold_years),
-            run_type='analysis',
-            status='pending',
-            progress=0.0,
-            scoring_model_id=request.scoring_model_id
-        )
+    def save_run() -> int:
         db.add(run)
         db.commit()
         db.refresh(run)
-        run_id = run.id
-    finally:
-        db.close()
+        return run.id
+
+    run_id = await run_in_threadpool(save_run)
 
     # Initialize job tracking
-    running_analysis_jobs[run_id] = {
-        'status': 'running',
-        'progress': 0,
-        'message': 'Starting...',
-        'results': None,
-        'weights': weights,
-        'threshold': request.threshold
-    }
+    await running_analysis_jobs.aset(
+        run_id,
+        status='running',
+        progress=0,
+        message='Starting...',
+        weights=weights,
+        threshold=request.threshold
+    )
 
     # Run analysis in background
-    background_tasks.add_task(
+    submit_job(
         run_analysis_background,
         run_id,
         datetime.combine(request.start_date, datetime.min.time()),
@@ -112,9 +156,7 @@ def run_analysis_background(
     threshold: float
 ):
     """Background task to run analysis"""
-    def progress_callback(progress: float, message: str):
-        running_analysis_jobs[run_id]['progress'] = progress
-        running_analysis_jobs[run_id]['message'] = message
+    progress_callback = running_analysis_jobs.progress_callback(run_id)
 
     try:
         # Run training analysis to get all picks
@@ -125,29 +167,18 @@ def run_analysis_background(
             progress_callback
         )
 
-        # Apply scoring model to filter picks
-        filtered_picks = []
-        for pick in results['picks']:
-            score = calculate_confidence_score(
-                pick['ticker'],
-                pick['daily_loss_pct'],
-                pick['ranking'],
-                pick['industry'],
-                pick['dividend_yield'],
-                pick['volume'],
-                weights
-            )
+        # Apply scoring model to filter picks, scoring them all in one compiled pass
+        picks = results['picks']
+        scores = score_picks(picks, weights)
+        keep = scores >= threshold
+        for pick, score in zip(picks, scores.tolist()):
             pick['confidence_score'] = score
-            if score >= threshold:
-                filtered_picks.append(pick)
+        filtered_picks = [pick for pick, kept in zip(picks, keep.tolist()) if kept]
 
         # Calculate summary stats for filtered picks
-        summary = calculate_analysis_summary(filtered_picks, results['picks'], hold_years)
+        summary = calculate_analysis_summary(pick_columns(picks, hold_years), keep, hold_years)
 
-        running_analysis_jobs[run_id]['status'] = 'completed'
-        running_analysis_jobs[run_id]['progress'] = 100
-        running_analysis_jobs[run_id]['message'] = 'Complete'
-        running_analysis_jobs[run_id]['results'] = {
+        save_analysis_results(run_id, {
             'all_picks': results['picks'],
             'filtered_picks': filtered_picks,
             'analysis': results['analysis'],
@@ -157,78 +188,91 @@ def run_analysis_background(
                 'weights': weights,
                 'threshold': threshold
             }
-        }
+        })
+
+        running_analysis_jobs.update(run_id, status='completed', progress=100, message='Complete')
 
         # Update database
-        db = get_sync_db()
-        try:
+        with SyncSessionLocal() as db:
             run = db.query(AnalysisRun).filter(AnalysisRun.id == run_id).first()
             if run:
                 run.status = 'completed'
                 run.progress = 100
                 run.completed_at = datetime.utcnow()
                 db.commit()
-        finally:
-            db.close()
 
     except Exception as e:
-        running_analysis_jobs[run_id]['status'] = 'failed'
-        running_analysis_jobs[run_id]['message'] = str(e)
+        running_analysis_jobs.update(run_id, status='failed', message=str(e))
 
-        db = get_sync_db()
-        try:
+        with SyncSessionLocal() as db:
             run = db.query(AnalysisRun).filter(AnalysisRun.id == run_id).first()
             if run:
                 run.status = 'failed'
                 db.commit()
-        finally:
-            db.close()
 
 
-def calculate_analysis_summary(filtered_picks: List[Dict], all_picks: List[Dict], hold_years: List[int]) -> Dict:
-    """Calculate summary statistics for the analysis"""
+def pick_columns(picks: List[Dict], hold_years: List[int]) -> Dict[str, np.ndarray]:
+    """
+    Column-major view of the picks' return fields: one float64 array per
+    return_{N}y / spy_return_{N}y key, with missing returns as NaN.
+    """
+    columns = {}
+    for years in hold_years:
+        for col in (f'return_{years}y', f'spy_return_{years}y'):
+            columns[col] = np.array([p.get(col) for p in picks], dtype=np.float64)
+    return columns
+
+
+def _return_stats(returns: np.ndarray, spy: np.ndarray) -> Optional[Dict]:
+    """Count, average, win rate and SPY average for one return column, or None if it has no values"""
+    returns = returns[~np.isnan(returns)]
+    if returns.size == 0:
+        return None
+    spy = spy[~np.isnan(spy)]
+
+    return {
+        'count': int(returns.size),
+        'avg_return': round(float(returns.mean()), 2),
+        'win_rate': round(float((returns > 0).mean() * 100), 2),
+        'spy_avg': round(float(spy.mean()), 2) if spy.size else None
+    }
+
+
+def calculate_analysis_summary(columns: Dict[str, np.ndarray], keep: np.ndarray, hold_years: List[int]) -> Dict:
+    """
+    Calculate summary statistics for the analysis.
+    columns is the output of pick_columns() for all picks; keep masks the filtered ones.
+    """
+    filtered_count = int(keep.sum())
+    total_count = len(keep)
     summary = {
-        'filtered_count': len(filtered_picks),
-        'total_count': len(all_picks),
-        'filter_rate': round(len(filtered_picks) / len(all_picks) * 100, 2) if all_picks else 0
+        'filtered_count': filtered_count,
+        'total_count': total_count,
+        'filter_rate': round(filtered_count / total_count * 100, 2) if total_count else 0
     }
 
     for years in hold_years:
-        return_col = f'return_{years}y'
-        spy_col = f'spy_return_{years}y'
+        returns = columns[f'return_{years}y']
+        spy = columns[f'spy_return_{years}y']
 
         # Filtered picks stats
-        filtered_returns = [p[return_col] for p in filtered_picks if p.get(return_col) is not None]
-        filtered_spy = [p[spy_col] for p in filtered_picks if p.get(spy_col) is not None]
-
-        if filtered_returns:
-            summary[f'{years}y_filtered'] = {
-                'count': len(filtered_returns),
-                'avg_return': round(sum(filtered_returns) / len(filtered_returns), 2),
-                'win_rate': round(sum(1 for r in filtered_returns if r > 0) / len(filtered_returns) * 100, 2),
-                'spy_avg': round(sum(filtered_spy) / len(filtered_spy), 2) if filtered_spy else None
-            }
+        filtered_stats = _return_stats(returns[keep], spy[keep])
+        if filtered_stats:
+            summary[f'{years}y_filtered'] = filtered_stats
 
         # All picks stats
-        all_returns = [p[return_col] for p in all_picks if p.get(return_col) is not None]
-        all_spy = [p[spy_col] for p in all_picks if p.get(spy_col) is not None]
-
-        if all_returns:
-            summary[f'{years}y_all'] = {
-                'count': len(all_returns),
-                'avg_return': round(sum(all_returns) / len(all_returns), 2),
-                'win_rate': round(sum(1 for r in all_returns if r > 0) / len(all_returns) * 100, 2),
-                'spy_avg': round(sum(all_spy) / len(all_spy), 2) if all_spy else None
-            }
+        all_stats = _return_stats(returns, spy)
+        if all_stats:
+            summary[f'{years}y_all'] = all_stats
 
     return summary
 
 
 @router.get("/{run_id}/status", response_model=AnalysisStatusResponse)
-async def get_analysis_status(run_id: int):
+async def get_analysis_status(run_id: int, db: Session = Depends(get_sync_db)):
     """Get the status of an analysis run"""
-    if run_id in running_analysis_jobs:
-        job = running_analysis_jobs[run_id]
+    job = await running_analysis_jobs.aget(run_id)
+    if job:
         return AnalysisStatusResponse(
             run_id=run_id,
             status=job['status'],
@@ -236,61 +280,64 @@ async def get_analysis_status(run_id: int):
             message=job.get('message')
         )
 
-    db = get_sync_db()
-    try:
-        run = db.query(AnalysisRun).filter(AnalysisRun.id == run_id).first()
-        if not run:
-            raise HTTPException(status_code=404, detail="Analysis run not found")
+    run = await run_in_threadpool(lambda: db.query(AnalysisRun).filter(AnalysisRun.id == run_id).first())
+    if not run:
+        raise HTTPException(status_code=404, detail="Analysis run not found")
 
-        return AnalysisStatusResponse(
-            run_id=run_id,
-            status=run.status,
-            progress=run.progress,
-            message=None
-        )
-    finally:
-        db.close()
+    return AnalysisStatusResponse(
+        run_id=run_id,
+        status=run.status,
+        progress=run.progress,
+        message=None
+    )
 
 
 @router.get("/{run_id}/results")
 async def get_analysis_results(run_id: int):
     """Get the results of a completed analysis run"""
-    if run_id in running_analysis_jobs:
-        job = running_analysis_jobs[run_id]
-        if job['status'] != 'completed':
-            raise HTTPException(
-                status_code=400,
-                detail=f"Analysis run is {job['status']}, not completed"
-            )
-        return job['results']
+    job = await running_analysis_jobs.aget(run_id)
+    if job and job['status'] != 'completed':
+        raise HTTPException(
+            status_code=400,
+            detail=f"Analysis run is {job['status']}, not completed"
+        )
 
-    raise HTTPException(status_code=404, detail="Analysis results not found")
+    results = await run_in_threadpool(load_analysis_results, run_id)
+    if results is None:
+        raise HTTPException(status_code=404, detail="Analysis results not found")
+    return results
 
 
 @router.get("/{run_id}/export")
 async def export_analysis_csv(run_id: int):
     """Export analysis results as CSV"""
-    if run_id not in running_analysis_jobs:
-        raise HTTPException(status_code=404, detail="Analysis results not found")
-
-    job = running_analysis_jobs[run_id]
-    if job['status'] != 'completed':
+    job = await running_analysis_jobs.aget(run_id)
+    if job and job['status'] != 'completed':
         raise HTTPException(status_code=400, detail="Analysis not completed")
 
-    results = job['results']
+    results = await run_in_threadpool(load_analysis_results, run_id)
+    if results is None:
+        raise HTTPException(status_code=404, detail="Analysis results not found")
+
     picks = results.get('filtered_picks', [])
 
-    # Create CSV
-    output = io.StringIO()
-    if picks:
-        fieldnames = list(picks[0].keys())
-        writer = csv.DictWriter(output, fieldnames=fieldnames)
+    # Stream the CSV in ~64KB chunks rather than building it all in memory
+    def generate_csv():
+        if not picks:
+            return
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=list(picks[0].keys()))
         writer.writeheader()
-        writer.writerows(picks)
+        for pick in picks:
+            writer.writerow(pick)
+            if buffer.tell() > CSV_CHUNK_SIZE:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
 
-    output.seek(0)
     return StreamingResponse(
-        iter([output.getvalue()]),
+        generate_csv(),
         media_type="text/csv",
         headers={"Content-Disposition": f"attachment; filename=analysis_{run_id}.csv"}
     )
@@ -8,8 +8,10 @@ from typing import List, Optional
 from app.services.stock_data import (
     sp500_historical,
     load_stock_metadata,
+    load_stock_metadata_frame,
     get_sp500_tickers_for_date,
-    get_all_historical_tickers
+    get_all_historical_tickers,
+    clear_data_caches
 )
 
 router = APIRouter()
@@ -27,7 +29,7 @@ async def get_sp500_tickers(for_date: Optional[date] = None):
         return {
             'date': for_date.isoformat(),
             'count': len(tickers),
-            'tickers': sorted(tickers)
+            'tickers': tickers
         }
     else:
         tickers = get_all_historical_tickers()
@@ -74,14 +76,17 @@ async def get_stock_metadata(ticker: Optional[str] = None):
 @router.get("/industries")
 async def get_industries():
     """Get a list of all unique industries"""
-    metadata = load_stock_metadata()
-    industries = {}
-    for data in metadata.values():
-        industry = data['industry']
-        industries[industry] = industries.get(industry, 0) + 1
-
-    sorted_industries = sorted(industries.items(), key=lambda x: -x[1])
+    stocks_df = load_stock_metadata_frame()
+    # Most common first; ties keep first-seen order
+    counts = stocks_df['industry'].value_counts() if not stocks_df.empty else {}
     return {
-        'count': len(industries),
-        'industries': [{'name': k, 'stock_count': v} for k, v in sorted_industries]
+        'count': len(counts),
+        'industries': [{'name': k, 'stock_count': int(v)} for k, v in counts.items()]
     }
+
+
+@router.post("/cache/clear")
+async def clear_cache():
+    """Reload stock metadata and S&P 500 constituents from disk on next use (e.g. after update_tickers)"""
+    clear_data_caches()
+    return {"message": "Data caches cleared"}
@@ -1,15 +1,17 @@
 """
 Scoring Models API endpoints for saving and managing scoring configurations.
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
 from pydantic import BaseModel
 from datetime import datetime
 from typing import List, Optional, Dict, Any
-import json
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.database import get_sync_db, init_db_sync
+from app.db.database import get_db
 from app.db.models import ScoringModel
-from app.services.scoring import weights_to_json, weights_from_json, DEFAULT_WEIGHTS
+from app.services.scoring import DEFAULT_WEIGHTS
+from app.services.response_cache import response_cache, MODELS_KEY, weak_etag, etag_matches
 
 router = APIRouter()
 
@@ -38,28 +40,12 @@ class ModelResponse(BaseModel):
 
 def parse_model(m: ScoringModel) -> ModelResponse:
     """Parse a ScoringModel into a ModelResponse"""
-    formula = None
-    weights = None
-
-    # Try to parse formula first (new format)
-    if m.formula:
-        try:
-            formula = json.loads(m.formula)
-        except:
-            pass
-
-    # Fall back to legacy weights
-    if m.weights:
-        try:
-            weights = weights_from_json(m.weights)
-        except:
-            pass
-
+    # formula (new format) and legacy weights come back from their JSON columns already decoded
     return ModelResponse(
         id=m.id,
         name=m.name,
-        formula=formula,
-        weights=weights,
+        formula=m.formula or None,
+        weights=m.weights or None,
         threshold=m.threshold or 65.0,
         training_run_id=m.training_run_id,
         avg_return=m.avg_return,
@@ -69,69 +55,72 @@ def parse_model(m: ScoringModel) -> ModelResponse:
 
 
 @router.get("/")
-async def list_models():
+async def list_models(request: Request, response: Response, db: AsyncSession = Depends(get_db)):
     """List all saved scoring models"""
-    init_db_sync()
-    db = get_sync_db()
-    try:
-        models = db.query(ScoringModel).order_by(ScoringModel.created_at.desc()).all()
-        return [parse_model(m) for m in models]
-    finally:
-        db.close()
+    # Models are only ever added or deleted, so the newest timestamp and the row
+    # count identify the listing; unchanged polls get a 304 without a body
+    newest, count = (await db.execute(
+        select(func.max(ScoringModel.created_at), func.count(ScoringModel.id))
+    )).one()
+    etag = weak_etag(newest, count)
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+
+    # Polled by the frontend; served from a short-lived cache between writes,
+    # and only for the ETag the cached listing was built under
+    cached = response_cache.get(MODELS_KEY)
+    if cached is not None and cached[0] == etag:
+        return cached[1]
+
+    # Async session: the event loop serves other requests while the query runs
+    result = await db.execute(select(ScoringModel).order_by(ScoringModel.created_at.desc()))
+    models = [parse_model(m) for m in result.scalars().all()]
+    response_cache.set(MODELS_KEY, (etag, models))
+    return models
 
 
 @router.post("/")
-async def create_model(request: CreateModelRequest):
+async def create_model(request: CreateModelRequest, db: AsyncSession = Depends(get_db)):
     """Save a new scoring model"""
-    init_db_sync()
-    db = get_sync_db()
-    try:
-        model = ScoringModel(
-            name=request.name,
-            formula=json.dumps(request.formula) if request.formula else None,
-            weights=weights_to_json(request.weights) if request.weights else None,
-            threshold=request.threshold,
-            training_run_id=request.training_run_id,
-            avg_return=request.avg_return,
-            win_rate=request.win_rate
-        )
-        db.add(model)
-        db.commit()
-        db.refresh(model)
-
-        return parse_model(model)
-    finally:
-        db.close()
+    model = ScoringModel(
+        name=request.name,
+        formula=request.formula or None,
+        weights=request.weights or None,
+        threshold=request.threshold,
+        training_run_id=request.training_run_id,
+        avg_return=request.avg_return,
+        win_rate=request.win_rate
+    )
+    db.add(model)
+    await db.commit()
+    await db.refresh(model)
+    response_cache.invalidate(MODELS_KEY)
+
+    return parse_model(model)
 
 
 @router.get("/{model_id}")
-async def get_model(model_id: int):
+async def get_model(model_id: int, db: AsyncSession = Depends(get_db)):
     """Get a specific scoring model"""
-    db = get_sync_db()
-    try:
-        model = db.query(ScoringModel).filter(ScoringModel.id == model_id).first()
-        if not model:
-            raise HTTPException(status_code=404, detail="Model not found")
+    model = await db.get(ScoringModel, model_id)
+    if not model:
+        raise HTTPException(status_code=404, detail="Model not found")
 
-        return parse_model(model)
-    finally:
-        db.close()
+    return parse_model(model)
 
 
 @router.delete("/{model_id}")
-async def delete_model(model_id: int):
+async def delete_model(model_id: int, db: AsyncSession = Depends(get_db)):
     """Delete a scoring model"""
-    db = get_sync_db()
-    try:
-        model = db.query(ScoringModel).filter(ScoringModel.id == model_id).first()
-        if not model:
-            raise HTTPException(status_code=404, detail="Model not found")
-
-        db.delete(model)
-        db.commit()
-        return {"message": "Model deleted"}
-    finally:
-        db.close()
+    model = await db.get(ScoringModel, model_id)
+    if not model:
+        raise HTTPException(status_code=404, detail="Model not found")
+
+    await db.delete(model)
+    await db.commit()
+    response_cache.invalidate(MODELS_KEY)
+    return {"message": "Model deleted"}
 
 
 @router.get("/defaults/weights")
@@ -1,21 +1,30 @@
 """
 Training API endpoints for running analysis and discovering optimal scoring weights.
 """
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
 from datetime import datetime, date
 from typing import List, Optional, Dict, Any
-import json
+import orjson
+from sqlalchemy import case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.database import get_sync_db, init_db_sync
+from app.db.database import get_db, AsyncSessionLocal, SyncSessionLocal
 from app.db.models import AnalysisRun, StockPick, ScoringModel
 from app.services.training import run_training_analysis, evaluate_model, analyze_training_results
-from app.services.scoring import weights_to_json, DEFAULT_WEIGHTS
+from app.services.scoring import DEFAULT_WEIGHTS
+from app.services.response_cache import response_cache, MODELS_KEY, TRAINING_RUNS_KEY, weak_etag, etag_matches
+from app.services.job_store import JobStore, submit_job
 
 router = APIRouter()
 
-# In-memory storage for running jobs (for progress tracking during execution)
-running_jobs: Dict[int, Dict[str, Any]] = {}
+# Progress tracking for running jobs (Redis when configured, else in-memory)
+running_jobs = JobStore("training")
+
+# Training runs fetched per round-trip when streaming the run listing
+RUNS_BATCH_SIZE = 100
 
 
 class TrainingRequest(BaseModel):
@@ -39,42 +48,42 @@ class EvaluateModelRequest(BaseModel):
 
 
 @router.post("/run", response_model=TrainingStatusResponse)
-async def start_training(request: TrainingRequest, background_tasks: BackgroundTasks):
+async def start_training(
+    request: TrainingRequest,
+    db: AsyncSession = Depends(get_db)
+):
     """
     Start a new training run.
     This fetches historical data and analyzes biggest loser patterns.
     Results are persisted to the database for later use.
     """
     # Create analysis run record
-    init_db_sync()
-    db = get_sync_db()
+    run = AnalysisRun(
+        start_date=request.start_date,
+        end_date=request.end_date,
+        hold_period_years=max(request.hold_years),
+        run_type='training',
+        status='pending',
+        progress=0.0
+    )
 
-    try:
-        run = AnalysisRun(
-            start_date=request.start_date,
-            end_date=request.end_date,
-            hold_period_years=max(request.hold_years),
-            run_type='training',
-            status='pending',
-            progress=0.0
-        )
-        db.add(run)
-        db.commit()
-        db.refresh(run)
-        run_id = run.id
-    finally:
-        db.close()
+    db.add(run)
+    await db.commit()
+    await db.refresh(run)
+    run_id = run.id
+    response_cache.invalidate(TRAINING_RUNS_KEY)
 
     # Initialize job tracking
-    running_jobs[run_id] = {
-        'status': 'running',
-        'progress': 0,
-        'message': 'Starting...',
-        'results': None
-    }
+    await running_jobs.aset(
+        run_id,
+        status='running',
+        progress=0,
+        message='Starting...',
+        results=None
+    )
 
     # Run analysis in background
-    background_tasks.add_task(
+    submit_job(
         run_training_background,
         run_id,
         datetime.combine(request.start_date, datetime.min.time()),
@@ -97,9 +106,7 @@ def run_training_background(
     hold_years: List[int]
 ):
     """Background task to run training analysis and persist results to database"""
-    def progress_callback(progress: float, message: str):
-        running_jobs[run_id]['progress'] = progress
-        running_jobs[run_id]['message'] = message
+    progress_callback = running_jobs.progress_callback(run_id)
 
     try:
         results = run_training_analysis(
@@ -109,28 +116,31 @@ def run_training_background(
             progress_callback
         )
 
-        # Save picks to database
-        db = get_sync_db()
-        try:
-            for pick_data in results['picks']:
-                pick = StockPick(
-                    run_id=run_id,
-                    loser_date=datetime.strptime(pick_data['loser_date'], '%Y-%m-%d').date(),
-                    purchase_date=datetime.strptime(pick_data['purchase_date'], '%Y-%m-%d').date() if pick_data.get('purchase_date') else None,
-                    purchase_price=pick_data.get('purchase_price'),
-                    ticker=pick_data['ticker'],
-                    daily_loss_pct=pick_data['daily_loss_pct'],
-                    ranking=pick_data['ranking'],
-                    industry=pick_data.get('industry'),
-                    dividend_yield=pick_data.get('dividend_yield'),
-                    volume=pick_data.get('volume'),
-                    confidence_score=pick_data.get('confidence_score'),
-                    return_2y=pick_data.get('return_2y'),
-                    return_5y=pick_data.get('return_5y'),
-                    spy_return_2y=pick_data.get('spy_return_2y'),
-                    spy_return_5y=pick_data.get('spy_return_5y'),
-                )
-                db.add(pick)
+        # Save picks to database in one bulk INSERT (no per-object ORM
+        # bookkeeping), inside the same transaction as the status update
+        with SyncSessionLocal() as db:
+            rows = [
+                {
+                    'run_id': run_id,
+                    'loser_date': date.fromisoformat(pick_data['loser_date']),
+                    'purchase_date': date.fromisoformat(pick_data['purchase_date']) if pick_data.get('purchase_date') else None,
+                    'purchase_price': pick_data.get('purchase_price'),
+                    'ticker': pick_data['ticker'],
+                    'daily_loss_pct': pick_data['daily_loss_pct'],
+                    'ranking': pick_data['ranking'],
+                    'industry': pick_data.get('industry'),
+                    'dividend_yield': pick_data.get('dividend_yield'),
+                    'volume': pick_data.get('volume'),
+                    'confidence_score': pick_data.get('confidence_score'),
+                    'return_2y': pick_data.get('return_2y'),
+                    'return_5y': pick_data.get('return_5y'),
+                    'spy_return_2y': pick_data.get('spy_return_2y'),
+                    'spy_return_5y': pick_data.get('spy_return_5y'),
+                }
+                for pick_data in results['picks']
+            ]
+            if rows:
+                db.execute(StockPick.__table__.insert(), rows)
 
             # Update run status
             run = db.query(AnalysisRun).filter(AnalysisRun.id == run_id).first()
@@ -138,6 +148,8 @@ def run_training_background(
                 run.status = 'completed'
                 run.progress = 100
                 run.completed_at = datetime.utcnow()
+                run.analysis_json = results['analysis']
+                run.summary_json = results['summary']
 
             # Auto-create a scoring model from the discovered formula
             model_created = False
@@ -161,7 +173,7 @@ def run_training_background(
                         new_model = ScoringModel(
                             name=model_name,
                             training_run_id=run_id,
-                            formula=json.dumps(formula),
+                            formula=formula,
                             avg_return=avg_return,
                             win_rate=win_rate,
                         )
@@ -169,35 +181,34 @@ def run_training_background(
                         model_created = True
 
             db.commit()
-        finally:
-            db.close()
+        response_cache.invalidate(TRAINING_RUNS_KEY, MODELS_KEY)
 
         # Keep results in memory for immediate access
-        running_jobs[run_id]['status'] = 'completed'
-        running_jobs[run_id]['progress'] = 100
-        running_jobs[run_id]['message'] = 'Complete - Model created' if model_created else 'Complete'
-        running_jobs[run_id]['results'] = results
+        running_jobs.update(
+            run_id,
+            status='completed',
+            progress=100,
+            message='Complete - Model created' if model_created else 'Complete',
+            results=results
+        )
 
     except Exception as e:
-        running_jobs[run_id]['status'] = 'failed'
-        running_jobs[run_id]['message'] = str(e)
+        running_jobs.update(run_id, status='failed', message=str(e))
 
         # Update database
-        db = get_sync_db()
-        try:
+        with SyncSessionLocal() as db:
             run = db.query(AnalysisRun).filter(AnalysisRun.id == run_id).first()
             if run:
                 run.status = 'failed'
                 db.commit()
-        finally:
-            db.close()
+        response_cache.invalidate(TRAINING_RUNS_KEY)
 
 
 @router.get("/{run_id}/status", response_model=TrainingStatusResponse)
-async def get_training_status(run_id: int):
+async def get_training_status(run_id: int, db: AsyncSession = Depends(get_db)):
     """Get the status of a training run"""
-    if run_id in running_jobs:
-        job = running_jobs[run_id]
+    job = await running_jobs.aget(run_id)
+    if job:
         return TrainingStatusResponse(
             run_id=run_id,
             status=job['status'],
@@ -206,146 +217,222 @@ async def get_training_status(run_id: int):
         )
 
     # Check database
-    db = get_sync_db()
-    try:
-        run = db.query(AnalysisRun).filter(AnalysisRun.id == run_id).first()
-        if not run:
-            raise HTTPException(status_code=404, detail="Training run not found")
+    run = await db.get(AnalysisRun, run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Training run not found")
 
-        return TrainingStatusResponse(
-            run_id=run_id,
-            status=run.status,
-            progress=run.progress,
-            message=None
-        )
-    finally:
-        db.close()
+    return TrainingStatusResponse(
+        run_id=run_id,
+        status=run.status,
+        progress=run.progress,
+        message=None
+    )
+
+
+# Stored pick columns, in the key order run_training_analysis produces
+PICK_COLUMNS = (
+    StockPick.loser_date,
+    StockPick.purchase_date,
+    StockPick.purchase_price,
+    StockPick.ticker,
+    StockPick.daily_loss_pct,
+    StockPick.ranking,
+    StockPick.industry,
+    StockPick.dividend_yield,
+    StockPick.volume,
+    StockPick.confidence_score,
+    StockPick.return_2y,
+    StockPick.return_5y,
+    StockPick.spy_return_2y,
+    StockPick.spy_return_5y,
+)
+
+
+async def load_picks(db: AsyncSession, run_id: int) -> List[Dict[str, Any]]:
+    """
+    A run's stored picks as plain dicts, straight from column rows.
+    Dates stay date objects; orjson writes them as YYYY-MM-DD.
+    """
+    result = await db.execute(select(*PICK_COLUMNS).where(StockPick.run_id == run_id))
+    return [row._asdict() for row in result]
+
+
+def results_response(results: Dict[str, Any]) -> Response:
+    """
+    Serialize results in one orjson pass; returning the dict would first send
+    every pick through FastAPI's jsonable_encoder.
+    """
+    return Response(
+        content=orjson.dumps(results, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY),
+        media_type="application/json"
+    )
 
 
 @router.get("/{run_id}/results")
-async def get_training_results(run_id: int):
+async def get_training_results(run_id: int, include_picks: bool = True, db: AsyncSession = Depends(get_db)):
     """
     Get the results of a completed training run.
     First checks in-memory cache, then loads from database if needed.
+    With include_picks=false only the analysis and summary are returned.
     """
     # Check in-memory first (for recently completed runs)
-    if run_id in running_jobs:
-        job = running_jobs[run_id]
-        if job['status'] == 'completed' and job['results']:
-            return job['results']
+    job = await running_jobs.aget(run_id)
+    if job and job['status'] == 'completed' and job.get('results'):
+        results = job['results']
+        if not include_picks:
+            results = {'analysis': results['analysis'], 'summary': results['summary']}
+        return results_response(results)
 
     # Load from database
-    db = get_sync_db()
-    try:
-        run = db.query(AnalysisRun).filter(AnalysisRun.id == run_id).first()
-        if not run:
-            raise HTTPException(status_code=404, detail="Training run not found")
-
-        if run.status != 'completed':
-            raise HTTPException(
-                status_code=400,
-                detail=f"Training run is {run.status}, not completed"
-            )
-
-        # Load picks from database
-        picks = db.query(StockPick).filter(StockPick.run_id == run_id).all()
-
-        # Convert to dict format
-        picks_data = []
-        for pick in picks:
-            picks_data.append({
-                'loser_date': pick.loser_date.strftime('%Y-%m-%d'),
-                'purchase_date': pick.purchase_date.strftime('%Y-%m-%d') if pick.purchase_date else None,
-                'purchase_price': pick.purchase_price,
-                'ticker': pick.ticker,
-                'daily_loss_pct': pick.daily_loss_pct,
-                'ranking': pick.ranking,
-                'industry': pick.industry,
-                'dividend_yield': pick.dividend_yield,
-                'volume': pick.volume,
-                'confidence_score': pick.confidence_score,
-                'return_2y': pick.return_2y,
-                'return_5y': pick.return_5y,
-                'spy_return_2y': pick.spy_return_2y,
-                'spy_return_5y': pick.spy_return_5y,
-            })
-
-        # Determine hold years from available data
-        hold_years = []
-        if any(p['return_2y'] is not None for p in picks_data):
-            hold_years.append(2)
-        if any(p['return_5y'] is not None for p in picks_data):
-            hold_years.append(5)
-
-        # Re-run analysis on loaded data
-        analysis = analyze_training_results(picks_data, hold_years)
-
-        return {
-            'picks': picks_data,
-            'analysis': analysis,
-            'summary': {
-                'start_date': run.start_date.strftime('%Y-%m-%d'),
-                'end_date': run.end_date.strftime('%Y-%m-%d'),
-                'total_trading_days': len(set(p['loser_date'] for p in picks_data)),
-                'total_picks': len(picks_data),
-                'hold_periods': hold_years
-            }
+    run = await db.get(AnalysisRun, run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Training run not found")
+
+    if run.status != 'completed':
+        raise HTTPException(
+            status_code=400,
+            detail=f"Training run is {run.status}, not completed"
+        )
+
+    # Analysis and summary stored at completion: no recompute, and picks are only
+    # loaded when asked for
+    if run.analysis_json is not None and run.summary_json is not None:
+        results = {'analysis': run.analysis_json, 'summary': run.summary_json}
+        if include_picks:
+            results = {'picks': await load_picks(db, run_id), **results}
+        return results_response(results)
+
+    # Runs completed before analyses were stored: rebuild from the picks.
+    # The distinct-day count is aggregated by the database
+    picks_data = await load_picks(db, run_id)
+    total_trading_days = await db.scalar(
+        select(func.count(func.distinct(StockPick.loser_date))).where(StockPick.run_id == run_id)
+    )
+
+    # Determine hold years from available data
+    hold_years = []
+    if any(p['return_2y'] is not None for p in picks_data):
+        hold_years.append(2)
+    if any(p['return_5y'] is not None for p in picks_data):
+        hold_years.append(5)
+
+    # Re-run analysis on loaded data, off the event loop since it is CPU-bound
+    analysis = await run_in_threadpool(analyze_training_results, picks_data, hold_years)
+
+    results = {
+        'analysis': analysis,
+        'summary': {
+            'start_date': run.start_date,
+            'end_date': run.end_date,
+            'total_trading_days': total_trading_days,
+            'total_picks': len(picks_data),
+            'hold_periods': hold_years
         }
-    finally:
-        db.close()
+    }
+    if include_picks:
+        results = {'picks': picks_data, **results}
+    return results_response(results)
 
 
 @router.get("/runs")
-async def list_training_runs():
-    """List all training runs"""
-    db = get_sync_db()
-    try:
-        runs = db.query(AnalysisRun).filter(
-            AnalysisRun.run_type == 'training'
-        ).order_by(AnalysisRun.created_at.desc()).all()
-
-        return [
-            {
-                'id': run.id,
-                'start_date': run.start_date.strftime('%Y-%m-%d'),
-                'end_date': run.end_date.strftime('%Y-%m-%d'),
-                'status': run.status,
-                'created_at': run.created_at.isoformat(),
-                'completed_at': run.completed_at.isoformat() if run.completed_at else None,
-                'pick_count': db.query(StockPick).filter(StockPick.run_id == run.id).count()
-            }
-            for run in runs
-        ]
-    finally:
-        db.close()
+async def list_training_runs(request: Request, db: AsyncSession = Depends(get_db)):
+    """List all training runs, streamed as a JSON array"""
+    # Runs are added, deleted, and finished (picks are saved with the status change),
+    # so these identify the listing; unchanged polls get a 304 without a body
+    newest, count, finished, last_completed = (await db.execute(
+        select(
+            func.max(AnalysisRun.created_at),
+            func.count(AnalysisRun.id),
+            func.sum(case((AnalysisRun.status.in_(('completed', 'failed')), 1), else_=0)),
+            func.max(AnalysisRun.completed_at)
+        ).where(AnalysisRun.run_type == 'training')
+    )).one()
+    etag = weak_etag(newest, count, finished, last_completed)
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    headers = {"ETag": etag}
+
+    # Polled by the frontend; served from a short-lived cache between writes.
+    # The body is stored with the ETag it was built under and only served for
+    # that ETag, so a body cached across a write (a listing that was streaming
+    # when it happened, or another worker's cache) is never sent under a newer one
+    cached = response_cache.get(TRAINING_RUNS_KEY)
+    if cached is not None and cached[0] == etag:
+        return Response(content=cached[1], media_type="application/json", headers=headers)
+
+    # Pick counts come from one LEFT JOIN ... GROUP BY instead of a COUNT per run;
+    # only the listed columns are selected (plain rows, no ORM objects), and rows
+    # are fetched RUNS_BATCH_SIZE at a time rather than all at once
+    stmt = (
+        select(
+            AnalysisRun.id,
+            AnalysisRun.start_date,
+            AnalysisRun.end_date,
+            AnalysisRun.status,
+            AnalysisRun.created_at,
+            AnalysisRun.completed_at,
+            func.count(StockPick.id).label('pick_count')
+        )
+        .outerjoin(StockPick, StockPick.run_id == AnalysisRun.id)
+        .where(AnalysisRun.run_type == 'training')
+        .group_by(AnalysisRun.id)
+        .order_by(AnalysisRun.created_at.desc())
+        .execution_options(yield_per=RUNS_BATCH_SIZE)
+    )
+
+    async def generate_json():
+        # The session lives in the generator: the body is produced after the handler returns
+        chunks = [b'[']
+        yield chunks[0]
+        async with AsyncSessionLocal() as db:
+            result = await db.stream(stmt)
+            async for partition in result.partitions():
+                chunk = b','.join(
+                    orjson.dumps({
+                        'id': run_id,
+                        'start_date': start_date.isoformat(),
+                        'end_date': end_date.isoformat(),
+                        'status': status,
+                        'created_at': created_at.isoformat(),
+                        'completed_at': completed_at.isoformat() if completed_at else None,
+                        'pick_count': pick_count
+                    })
+                    for run_id, start_date, end_date, status, created_at, completed_at, pick_count in partition
+                )
+                if len(chunks) > 1:
+                    chunk = b',' + chunk
+                chunks.append(chunk)
+                yield chunk
+        chunks.append(b']')
+        yield chunks[-1]
+        response_cache.set(TRAINING_RUNS_KEY, (etag, b''.join(chunks)))
+
+    return StreamingResponse(generate_json(), media_type="application/json", headers=headers)
 
 
 @router.delete("/{run_id}")
-async def delete_training_run(run_id: int):
+async def delete_training_run(run_id: int, db: AsyncSession = Depends(get_db)):
     """Delete a training run and its picks"""
-    db = get_sync_db()
-    try:
-        run = db.query(AnalysisRun).filter(AnalysisRun.id == run_id).first()
-        if not run:
-            raise HTTPException(status_code=404, detail="Training run not found")
+    run = await db.get(AnalysisRun, run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Training run not found")
 
-        db.delete(run)  # Cascade will delete picks
-        db.commit()
+    await db.delete(run)  # Cascade will delete picks
+    await db.commit()
+    response_cache.invalidate(TRAINING_RUNS_KEY)
 
-        # Remove from memory if present
-        if run_id in running_jobs:
-            del running_jobs[run_id]
+    # Stop tracking it if present
+    await running_jobs.adelete(run_id)
 
-        return {"message": "Training run deleted"}
-    finally:
-        db.close()
+    return {"message": "Training run deleted"}
 
 
 @router.post("/evaluate")
-async def evaluate_scoring_model(request: EvaluateModelRequest):
+def evaluate_scoring_model(request: EvaluateModelRequest):
     """
     Evaluate a scoring model against training data.
     Allows testing different weights and thresholds.
+    Plain def: FastAPI runs this CPU-bound handler in the threadpool.
     """
     results = evaluate_model(
         request.picks,
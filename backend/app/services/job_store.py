@@ -0,0 +1,157 @@
+"""
+Background jobs: the executor that runs them and their status and progress,
+keyed by run id.
+
+Job status is kept in Redis when the redis package is installed and REDIS_URL is
+set, so every uvicorn worker sees the same jobs; otherwise it is kept in this process. Either way
+entries expire JOB_TTL seconds after their last update, so finished jobs don't
+accumulate - the run's database row is the durable record.
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import msgpack
+from fastapi.concurrency import run_in_threadpool
+
+from app.config import REDIS_URL
+
+try:
+    import redis
+except ImportError:  # redis is optional; fall back to in-process storage
+    redis = None
+
+
+# Long-running training/analysis jobs run here, at most JOB_WORKERS at a time,
+# instead of as per-request BackgroundTasks; the app shuts it down on exit
+JOB_WORKERS = 2
+job_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+
+JOB_TTL = 3600  # seconds
+# Redis calls give up after this many seconds instead of hanging the caller
+REDIS_TIMEOUT = 5.0
+# Larger field values (e.g. full results) stay out of Redis; readers fall back to the database
+MAX_REDIS_FIELD_BYTES = 1024 * 1024
+
+# Progress writes are skipped unless progress moved this many points, this many
+# seconds passed, or the message changed
+PROGRESS_MIN_STEP = 1.0
+PROGRESS_MIN_INTERVAL = 0.5
+
+
+def submit_job(func, *args) -> asyncio.Future:
+    """Start func(*args) on the job executor and return without waiting for it"""
+    return asyncio.get_running_loop().run_in_executor(job_executor, func, *args)
+
+
+class JobStore:
+    """Per-job field dicts with get/set/update/delete, expiring after JOB_TTL"""
+
+    def __init__(self, namespace: str, url: Optional[str] = REDIS_URL):
+        self.namespace = namespace
+        self._redis = (
+            redis.Redis.from_url(url, socket_timeout=REDIS_TIMEOUT, socket_connect_timeout=REDIS_TIMEOUT)
+            if url and redis is not None else None
+        )
+        self._local: Dict[int, Tuple[float, Dict[str, Any]]] = {}
+        self._lock = Lock()
+
+    def _key(self, run_id: int) -> str:
+        return f"{self.namespace}:{run_id}"
+
+    def set(self, run_id: int, **fields):
+        """Start tracking a job, replacing any previous entry"""
+        self.delete(run_id)
+        self.update(run_id, **fields)
+
+    def update(self, run_id: int, **fields):
+        """Change some of a job's fields and push back its expiry"""
+        if self._redis is not None:
+            mapping = {}
+            for name, value in fields.items():
+                try:
+                    packed = msgpack.packb(value, use_bin_type=True)
+                except (TypeError, ValueError):
+                    continue
+                if len(packed) <= MAX_REDIS_FIELD_BYTES:
+                    mapping[name] = packed
+            if mapping:
+                pipe = self._redis.pipeline()
+                pipe.hset(self._key(run_id), mapping=mapping)
+                pipe.expire(self._key(run_id), JOB_TTL)
+                pipe.execute()
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            _, job = self._local.get(run_id, (None, {}))
+            job.update(fields)
+            self._local[run_id] = (now + JOB_TTL, job)
+            # Prune finished jobs nobody has touched for JOB_TTL
+            for expired in [rid for rid, (expires, _) in self._local.items() if expires < now]:
+                del self._local[expired]
+
+    def progress_callback(self, run_id: int) -> Callable[[float, str], None]:
+        """
+        A progress_callback for run_training_analysis that records progress and
+        message on the job, throttled: the analysis reports per ticker while
+        fetching, and each write is a Redis round-trip when Redis is configured.
+        """
+        last = [float("-inf"), float("-inf"), None]  # progress, time, message
+
+        def callback(progress: float, message: str):
+            now = time.monotonic()
+            if (progress - last[0] < PROGRESS_MIN_STEP
+                    and now - last[1] < PROGRESS_MIN_INTERVAL
+                    and message == last[2]):
+                return
+            last[:] = [progress, now, message]
+            self.update(run_id, progress=progress, message=message)
+
+        return callback
+
+    def get(self, run_id: int) -> Optional[Dict[str, Any]]:
+        """A job's fields, or None if it isn't tracked (or has expired)"""
+        if self._redis is not None:
+            job = self._redis.hgetall(self._key(run_id))
+            if not job:
+                return None
+            return {
+                name.decode(): msgpack.unpackb(value, raw=False, strict_map_key=False)
+                for name, value in job.items()
+            }
+
+        with self._lock:
+            entry = self._local.get(run_id)
+            if entry is None or entry[0] < time.monotonic():
+                return None
+            return dict(entry[1])
+
+    def delete(self, run_id: int):
+        if self._redis is not None:
+            self._redis.delete(self._key(run_id))
+            return
+
+        with self._lock:
+            self._local.pop(run_id, None)
+
+    # For async request handlers: with Redis each call is a blocking network
+    # round-trip, so it runs in the threadpool instead of on the event loop.
+    # Background jobs already run in threads and call the methods above.
+
+    async def aset(self, run_id: int, **fields):
+        if self._redis is None:
+            return self.set(run_id, **fields)
+        await run_in_threadpool(self.set, run_id, **fields)
+
+    async def aget(self, run_id: int) -> Optional[Dict[str, Any]]:
+        if self._redis is None:
+            return self.get(run_id)
+        return await run_in_threadpool(self.get, run_id)
+
+    async def adelete(self, run_id: int):
+        if self._redis is None:
+            return self.delete(run_id)
+        await run_in_threadpool(self.delete, run_id)
@@ -0,0 +1,62 @@
+"""
+Short-lived in-process cache for read endpoints the frontend polls.
+Entries expire after a few seconds and are dropped early when a write changes them.
+Listings also carry an ETag so unchanged polls get a bodiless 304; a listing is
+cached together with its ETag and only served while that is still current.
+"""
+import hashlib
+import time
+from threading import Lock
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from fastapi import Request
+
+
+# Keys of the cached listings
+MODELS_KEY = "models"
+TRAINING_RUNS_KEY = "training_runs"
+
+
+class TTLCache:
+    """Values expire ttl seconds after they are stored"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+        self._lock = Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """The cached value, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                return None
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+
+    def invalidate(self, *keys: Hashable):
+        """Drop the given keys so the next read goes to the database"""
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+
+def weak_etag(*parts: Any) -> str:
+    """Weak ETag from values that change whenever the listing does"""
+    digest = hashlib.blake2b(":".join(map(str, parts)).encode(), digest_size=8).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether the client's If-None-Match already names this ETag"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]
+
+
+# Cached listings are shared by every request; callers must not modify them
+response_cache = TTLCache(ttl=5)
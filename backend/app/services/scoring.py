@@ -1,5 +1,7 @@
-import json
-from typing import Dict, Optional
+import re
+import orjson
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
 
 
 # Default weights based on original analysis
@@ -14,6 +16,21 @@ DEFAULT_WEIGHTS = {
 
 DEFAULT_THRESHOLD = 65.0
 
+# Industry keywords, matched case-insensitively in one scan each
+_TECH_HEALTH_RE = re.compile(r"technology|healthcare|software", re.IGNORECASE)
+_REIT_RE = re.compile(r"reit", re.IGNORECASE)
+
+
+@lru_cache(maxsize=1024)
+def classify_industry(industry: Optional[str]) -> Tuple[bool, bool]:
+    """
+    (is_tech_health, is_reit) for an industry name.
+    There are only a few hundred distinct industries, so each is classified once.
+    """
+    if not industry:
+        return False, False
+    return bool(_TECH_HEALTH_RE.search(industry)), bool(_REIT_RE.search(industry))
+
 
 def calculate_confidence_score(
     ticker: str,
@@ -41,10 +58,10 @@ def calculate_confidence_score(
     """
     w = weights or DEFAULT_WEIGHTS
     score = 0.0
-    industry_lower = industry.lower() if industry else ""
+    is_tech_health, is_reit = classify_industry(industry)
 
     # Industry: Technology or Healthcare bonus
-    if "technology" in industry_lower or "healthcare" in industry_lower or "software" in industry_lower:
+    if is_tech_health:
         score += w.get("industry", 15)
 
     # Dividend Yield: Low dividend yield is positive (growth stock indicator)
@@ -52,7 +69,7 @@ def calculate_confidence_score(
         score += w.get("dividends", 15)
 
     # REIT: Non-REIT stocks get bonus
-    if "reit" not in industry_lower:
+    if not is_reit:
         score += w.get("reit", 10)
 
     # Severity of Loss: Bigger losses may indicate oversold conditions
@@ -86,14 +103,21 @@ def filter_by_threshold(
 
 def weights_to_json(weights: Dict[str, float]) -> str:
     """Convert weights dict to JSON string for storage"""
-    return json.dumps(weights)
+    return orjson.dumps(weights).decode()
+
+
+@lru_cache(maxsize=1024)
+def _parse_weights(weights_json: str) -> Tuple[Tuple[str, float], ...]:
+    """Parsed weights as immutable items, so many models sharing a weights string parse it once"""
+    return tuple(orjson.loads(weights_json).items())
 
 
 def weights_from_json(weights_json: str) -> Dict[str, float]:
     """Parse weights from JSON string"""
     if not weights_json:
         return DEFAULT_WEIGHTS.copy()
-    return json.loads(weights_json)
+    # A fresh dict each call; the cached parse is shared
+    return dict(_parse_weights(weights_json))
 
 
 def suggest_weights_from_training(picks: list) -> Dict[str, float]:
@@ -102,63 +126,55 @@ def suggest_weights_from_training(picks: list) -> Dict[str, float]:
     Uses correlation analysis to determine which factors best predict positive returns.
     """
     import numpy as np
-    from scipy import stats
+    from app.services.scoring_jit import industry_flags
 
     if not picks:
         return DEFAULT_WEIGHTS.copy()
 
-    # Extract features and outcomes
+    # Keep picks with an outcome
+    scored = []
     returns = []
-    industries_tech_healthcare = []
-    low_dividends = []
-    non_reits = []
-    high_volumes = []
-    loss_severities = []
-    rankings = []
-
     for pick in picks:
         ret = pick.get('return_2y') or pick.get('return_5y')
         if ret is None:
             continue
-
+        scored.append(pick)
         returns.append(ret)
 
-        industry = (pick.get('industry') or '').lower()
-        industries_tech_healthcare.append(
-            1 if 'technology' in industry or 'healthcare' in industry or 'software' in industry else 0
-        )
-
-        low_dividends.append(1 if (pick.get('dividend_yield') or 0) < 1 else 0)
-        non_reits.append(0 if 'reit' in industry else 1)
-        high_volumes.append(1 if (pick.get('volume') or 0) > 30_000_000 else 0)
-        loss_severities.append(1 if (pick.get('daily_loss_pct') or 0) < -5 else 0)
-        rankings.append(6 - (pick.get('ranking') or 3))  # Invert so rank 1 = 5 points
-
     if len(returns) < 10:
         return DEFAULT_WEIGHTS.copy()
 
-    returns = np.array(returns)
-
-    # Calculate correlations with returns
-    correlations = {}
-
-    factors = {
-        'industry': industries_tech_healthcare,
-        'dividends': low_dividends,
-        'reit': non_reits,
-        'volume': high_volumes,
-        'severity_of_loss': loss_severities,
-        'ranking': rankings
-    }
-
-    total_correlation = 0
-    for name, values in factors.items():
-        if len(set(values)) > 1:  # Need variation
-            corr, _ = stats.pearsonr(values, returns)
-            correlations[name] = max(0, corr)  # Only positive correlations
-        else:
-            correlations[name] = 0
-        total_correlation += correlations[name]
+    returns = np.array(returns, dtype=np.float64)
+
+    # One (n_picks, n_factors) feature matrix; industries are classified once each
+    is_tech_health, is_reit = industry_flags([pick.get('industry') for pick in scored])
+    dividend_yield = np.array([pick.get('dividend_yield') or 0 for pick in scored], dtype=np.float64)
+    volume = np.array([pick.get('volume') or 0 for pick in scored], dtype=np.float64)
+    daily_loss_pct = np.array([pick.get('daily_loss_pct') or 0 for pick in scored], dtype=np.float64)
+    ranking = np.array([pick.get('ranking') or 3 for pick in scored], dtype=np.float64)
+
+    names = ('industry', 'dividends', 'reit', 'volume', 'severity_of_loss', 'ranking')
+    features = np.column_stack([
+        is_tech_health,
+        dividend_yield < 1,
+        ~is_reit,
+        volume > 30_000_000,
+        daily_loss_pct < -5,
+        6 - ranking,  # Invert so rank 1 = 5 points
+    ]).astype(np.float64)
+
+    # Pearson correlation of every factor with returns in one pass; factors
+    # without variation (and constant returns) get 0, only positive correlations count
+    centered = features - features.mean(axis=0)
+    centered_returns = returns - returns.mean()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        corr = centered.T @ centered_returns / (
+            np.linalg.norm(centered, axis=0) * np.linalg.norm(centered_returns)
+        )
+    varies = (features != features[0]).any(axis=0)
+    corr = np.where(varies, np.nan_to_num(corr), 0.0).clip(min=0)
+    correlations = dict(zip(names, corr.tolist()))
+    total_correlation = sum(correlations.values())
 
     # Normalize to sum to 100
     if total_correlation > 0:
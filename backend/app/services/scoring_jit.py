@@ -0,0 +1,117 @@
+"""
+Numba-compiled confidence scoring for scoring many picks in one pass.
+Mirrors calculate_confidence_score in scoring.py, over parallel arrays.
+"""
+import numpy as np
+from typing import Dict, List, Optional
+
+from app.services.scoring import DEFAULT_WEIGHTS, classify_industry
+
+try:
+    from numba import njit, prange
+except ImportError:  # numba is optional; fall back to plain Python
+    prange = range
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+
+# Fixed layout of the weights array passed to the kernel, with the same
+# per-key fallbacks calculate_confidence_score uses
+WEIGHT_KEYS = ("industry", "dividends", "reit", "severity_of_loss", "ranking", "volume")
+WEIGHT_FALLBACKS = (15, 15, 10, 30, 10, 20)
+
+
+def weights_array(weights: Optional[Dict[str, float]] = None) -> np.ndarray:
+    """Pack a weights dict into the kernel's fixed-layout float64 array"""
+    w = weights or DEFAULT_WEIGHTS
+    return np.array([w.get(key, fallback) for key, fallback in zip(WEIGHT_KEYS, WEIGHT_FALLBACKS)], dtype=np.float64)
+
+
+def industry_flags(industries: List[str]) -> tuple:
+    """(is_tech_health, is_reit) boolean arrays, via the cached classify_industry"""
+    flags = [classify_industry(industry) for industry in industries]
+    is_tech_health = np.array([tech_health for tech_health, _ in flags], dtype=np.bool_)
+    is_reit = np.array([reit for _, reit in flags], dtype=np.bool_)
+    return is_tech_health, is_reit
+
+
+@njit(parallel=True, cache=True)
+def _score_kernel(daily_loss_pct, ranking, is_tech_health, is_reit, dividend_yield, volume, w):
+    w_industry, w_dividends, w_reit, w_severity, w_ranking, w_volume = w[0], w[1], w[2], w[3], w[4], w[5]
+    scores = np.empty(daily_loss_pct.shape[0])
+    for i in prange(daily_loss_pct.shape[0]):
+        score = 0.0
+
+        # Industry: Technology or Healthcare bonus
+        if is_tech_health[i]:
+            score += w_industry
+
+        # Dividend Yield: Low dividend yield is positive
+        if dividend_yield[i] < 1:
+            score += w_dividends
+
+        # REIT: Non-REIT stocks get bonus
+        if not is_reit[i]:
+            score += w_reit
+
+        # Severity of Loss: full credit past -5%, partial credit otherwise
+        if daily_loss_pct[i] < -5:
+            score += w_severity
+        else:
+            partial = w_severity * ((100 - (5 + daily_loss_pct[i]) * 20) / 100)
+            score += max(0.0, partial)
+
+        # Volume: High volume bonus
+        if volume[i] > 30_000_000:
+            score += w_volume
+
+        # Ranking: Favor bigger losers
+        score += max(w_ranking - (ranking[i] - 1) * (w_ranking / 5), 0.0)
+
+        scores[i] = min(100.0, max(0.0, score))
+    return scores
+
+
+def calculate_confidence_scores_batch(
+    daily_loss_pct,
+    ranking,
+    industries: List[str],
+    dividend_yield,
+    volume,
+    weights: Optional[Dict[str, float]] = None
+) -> np.ndarray:
+    """
+    Confidence scores for parallel sequences of pick fields, same values as
+    calling calculate_confidence_score on each pick.
+    """
+    is_tech_health, is_reit = industry_flags(industries)
+    return _score_kernel(
+        np.asarray(daily_loss_pct, dtype=np.float64),
+        np.asarray(ranking, dtype=np.float64),
+        is_tech_health,
+        is_reit,
+        np.asarray(dividend_yield, dtype=np.float64),
+        np.asarray(volume, dtype=np.int64),
+        weights_array(weights),
+    )
+
+
+def score_picks(picks: List[Dict], weights: Optional[Dict[str, float]] = None) -> np.ndarray:
+    """
+    Confidence scores for a list of pick dicts, same values as calling
+    calculate_confidence_score on each pick.
+    """
+    if not picks:
+        return np.empty(0)
+
+    return calculate_confidence_scores_batch(
+        [p['daily_loss_pct'] for p in picks],
+        [p['ranking'] for p in picks],
+        [p['industry'] for p in picks],
+        [p['dividend_yield'] for p in picks],
+        [p['volume'] for p in picks],
+        weights,
+    )
@@ -1,11 +1,28 @@
+import numpy as np
 import pandas as pd
 import yfinance as yf
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Set
+from typing import Dict, FrozenSet, List, Optional, Set
 from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
 import csv
 
+from sqlalchemy import delete, insert, select
+
 from app.config import PROJECT_ROOT
+from app.db.database import sync_engine
+from app.db.models import PriceCache, PriceCacheSpan
+
+try:
+    from numba import njit, prange
+except ImportError:  # numba is optional; fall back to plain Python
+    prange = range
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
 
 
 # Historical S&P 500 constituents file (from fja05680/sp500 GitHub)
@@ -21,8 +38,12 @@ class SP500Historical:
     """
 
     def __init__(self):
-        self._data: Dict[datetime, Set[str]] = {}
+        self._data: Dict[datetime, FrozenSet[str]] = {}
         self._sorted_dates: List[datetime] = []
+        # Parallel to _sorted_dates: day ordinals (ints bisect faster than
+        # datetimes) and each date's constituents
+        self._ordinals: List[int] = []
+        self._constituents: List[FrozenSet[str]] = []
         self._loaded = False
 
     def load(self):
@@ -31,16 +52,19 @@ class SP500Historical:
             return
 
         try:
-            df = pd.read_csv(SP500_HISTORICAL_FILE)
-            for _, row in df.iterrows():
-                date = pd.to_datetime(row['date']).to_pydatetime()
-                tickers_str = row['tickers']
-                tickers = set(t.strip() for t in tickers_str.split(',') if t.strip())
+            df = pd.read_csv(SP500_HISTORICAL_FILE, parse_dates=['date'])
+            # Whole-column date conversion and splitting instead of a Series per row
+            dates = [date.to_pydatetime() for date in df['date']]
+            for date, symbols in zip(dates, df['tickers'].fillna('').str.split(',')):
+                tickers = set(t.strip() for t in symbols if t.strip())
                 # Exclude TSLA per original methodology
                 tickers.discard('TSLA')
-                self._data[date] = tickers
+                # Frozen: every lookup hands out the same set
+                self._data[date] = frozenset(tickers)
 
             self._sorted_dates = sorted(self._data.keys())
+            self._ordinals = [date.toordinal() for date in self._sorted_dates]
+            self._constituents = [self._data[date] for date in self._sorted_dates]
             self._loaded = True
             print(f"Loaded historical S&P 500 data: {len(self._sorted_dates)} dates from {self._sorted_dates[0].date()} to {self._sorted_dates[-1].date()}")
 
@@ -48,7 +72,7 @@ class SP500Historical:
             print(f"Error loading historical S&P 500 data: {e}")
             self._loaded = False
 
-    def get_tickers_for_date(self, date: datetime) -> Set[str]:
+    def get_tickers_for_date(self, date: datetime) -> FrozenSet[str]:
         """
         Get the S&P 500 constituents for a specific date.
         Uses the most recent data point on or before the given date.
@@ -57,17 +81,24 @@ class SP500Historical:
             self.load()
 
         if not self._sorted_dates:
-            return set()
+            return frozenset()
 
         # Find the most recent date on or before the target date
-        date_only = datetime(date.year, date.month, date.day)
-        idx = bisect_right(self._sorted_dates, date_only)
+        idx = bisect_right(self._ordinals, date.toordinal())
 
         if idx == 0:
             # Before our data starts, use earliest available
-            return self._data[self._sorted_dates[0]]
+            return self._constituents[0]
 
-        return self._data[self._sorted_dates[idx - 1]]
+        return self._constituents[idx - 1]
+
+    def invalidate(self):
+        """Drop the loaded data so the next lookup re-reads the CSV"""
+        self._data = {}
+        self._sorted_dates = []
+        self._ordinals = []
+        self._constituents = []
+        self._loaded = False
 
     def get_all_tickers(self) -> Set[str]:
         """Get all unique tickers that have ever been in the S&P 500"""
@@ -93,8 +124,12 @@ class SP500Historical:
 sp500_historical = SP500Historical()
 
 
+@lru_cache(maxsize=1)
 def load_stock_metadata() -> Dict[str, Dict]:
-    """Load stock metadata (industry, dividend yield, volume) from CSV"""
+    """
+    Load stock metadata (industry, dividend yield, volume) from CSV.
+    Parsed once and cached; callers share the dict and must not modify it.
+    """
     metadata = {}
     try:
         with open(STOCK_METADATA_FILE, 'r') as f:
@@ -118,16 +153,102 @@ def load_stock_metadata() -> Dict[str, Dict]:
     return metadata
 
 
+@lru_cache(maxsize=1)
+def load_stock_metadata_frame() -> pd.DataFrame:
+    """Stock metadata as a DataFrame indexed by ticker. Cached; must not be modified."""
+    return pd.DataFrame.from_dict(load_stock_metadata(), orient='index')
+
+
+def get_sp500_eligible_set(date: datetime) -> FrozenSet[str]:
+    """
+    The S&P 500 constituents for a specific date, for membership tests.
+    Returns the stored frozenset itself, without copying.
+    """
+    return sp500_historical.get_tickers_for_date(date)
+
+
+@lru_cache(maxsize=4096)
+def _sp500_tickers_for_day(day: datetime) -> List[str]:
+    return sorted(get_sp500_eligible_set(day))
+
+
 def get_sp500_tickers_for_date(date: datetime) -> List[str]:
-    """Get the S&P 500 constituents for a specific date"""
-    return list(sp500_historical.get_tickers_for_date(date))
+    """
+    Get the S&P 500 constituents for a specific date, sorted for display.
+    Cached per calendar day; callers share the list and must not modify it.
+    """
+    return _sp500_tickers_for_day(datetime(date.year, date.month, date.day))
 
 
+@lru_cache(maxsize=1)
 def get_all_historical_tickers() -> List[str]:
-    """Get all tickers that have ever been in the S&P 500"""
+    """
+    Get all tickers that have ever been in the S&P 500.
+    Cached; callers share the list and must not modify it.
+    """
     return list(sp500_historical.get_all_tickers())
 
 
+def clear_data_caches():
+    """Forget cached metadata and constituents so they are re-read from the CSV files"""
+    load_stock_metadata.cache_clear()
+    load_stock_metadata_frame.cache_clear()
+    _sp500_tickers_for_day.cache_clear()
+    get_all_historical_tickers.cache_clear()
+    sp500_historical.invalidate()
+
+
+# Tickers per yf.download call; keeps each multi-symbol request within URL limits
+DOWNLOAD_BATCH_SIZE = 100
+# Concurrent per-ticker requests when a batch download fails
+FALLBACK_FETCH_WORKERS = 16
+
+# Cached history is downloaded again once it is this old: adjusted prices are
+# rebased on every dividend and split, so a ticker's rows must come from one download
+PRICE_CACHE_TTL = timedelta(days=7)
+
+
+def _cached_spans(tickers: List[str]) -> Dict[str, tuple]:
+    """{ticker: (start_date, end_date, fetched_at)} of the windows held in price_cache"""
+    query = (
+        select(PriceCacheSpan.ticker, PriceCacheSpan.start_date, PriceCacheSpan.end_date, PriceCacheSpan.fetched_at)
+        .where(PriceCacheSpan.ticker.in_(tickers))
+    )
+    with sync_engine.connect() as conn:
+        return {ticker: (start, end, fetched_at) for ticker, start, end, fetched_at in conn.execute(query)}
+
+
+def store_prices(data: Dict[str, pd.DataFrame], windows: Dict[str, tuple]):
+    """
+    Replace each ticker's cached history with freshly downloaded OHLC rows and
+    record windows[ticker], the (start, end) window they were downloaded for.
+    """
+    fetched_at = datetime.utcnow()
+    with sync_engine.begin() as conn:
+        for ticker, hist in data.items():
+            conn.execute(delete(PriceCache).where(PriceCache.ticker == ticker))
+            conn.execute(delete(PriceCacheSpan).where(PriceCacheSpan.ticker == ticker))
+            rows = [
+                {
+                    'ticker': ticker,
+                    'date': day,
+                    'open_price': float(o),
+                    'high_price': float(h),
+                    'low_price': float(l),
+                    'close_price': float(c),
+                    'volume': int(v) if v == v else None,
+                }
+                for day, o, h, l, c, v in zip(
+                    hist.index.date, hist['Open'], hist['High'], hist['Low'], hist['Close'], hist['Volume']
+                )
+            ]
+            conn.execute(insert(PriceCache), rows)
+            start, end = windows[ticker]
+            conn.execute(
+                insert(PriceCacheSpan).values(ticker=ticker, start_date=start, end_date=end, fetched_at=fetched_at)
+            )
+
+
 def fetch_stock_data(
     tickers: List[str],
     start_date: datetime,
@@ -136,104 +257,446 @@ def fetch_stock_data(
 ) -> Dict[str, pd.DataFrame]:
     """
     Fetch historical OHLC data for multiple tickers.
-    Returns dict of {ticker: DataFrame with OHLC data}
+    Tickers whose cached span (the window their price_cache rows were downloaded
+    for) covers this window and is younger than PRICE_CACHE_TTL are read from
+    the database. The rest are downloaded and replace their cached history; a
+    ticker whose span only partly covers the window is downloaded for the union
+    of the two, so its history stays gap-free and on one adjustment baseline.
+    Returns dict of {ticker: DataFrame with OHLC data}, each indexed by date in
+    ascending order; the searchsorted lookups downstream rely on that.
     """
-    data = {}
-    total = len(tickers)
-
-    for i, ticker in enumerate(tickers):
+    # Only bars up to today can exist, however far out the window reaches
+    start_day = pd.Timestamp(start_date).date()
+    end_day = min(pd.Timestamp(end_date).date(), datetime.now().date())
+    spans = _cached_spans(tickers)
+    stale_before = datetime.utcnow() - PRICE_CACHE_TTL
+
+    cached = []
+    windows = {}  # ticker -> (start, end) day window to download
+    for ticker in tickers:
+        span = spans.get(ticker)
+        if span is None or span[2] < stale_before:
+            windows[ticker] = (start_day, end_day)
+        elif span[0] <= start_day and span[1] >= end_day:
+            cached.append(ticker)
+        else:
+            windows[ticker] = (min(span[0], start_day), max(span[1], end_day))
+    data = load_cached_prices(cached, start_day, end_day) if cached else {}
+
+    # Tickers sharing a download window go in the same requests
+    groups: Dict[tuple, List[str]] = {}
+    for ticker, window in windows.items():
+        groups.setdefault(window, []).append(ticker)
+
+    fetched = {}
+    total = len(windows)
+    done = 0
+
+    # One multi-symbol request (downloaded on yfinance's threads) per batch,
+    # instead of one request per ticker
+    for (window_start, window_end), group in groups.items():
+        fetch_start = datetime.combine(window_start, datetime.min.time())
+        fetch_end = datetime.combine(window_end, datetime.min.time())
+        for i in range(0, len(group), DOWNLOAD_BATCH_SIZE):
+            batch = group[i:i + DOWNLOAD_BATCH_SIZE]
+            try:
+                fetched.update(download_batch(batch, fetch_start, fetch_end))
+            except Exception as e:
+                # Retry ticker by ticker so one bad symbol can't sink the batch
+                print(f"Error fetching batch {batch[0]}..{batch[-1]}, fetching individually: {e}")
+                fetched.update(fetch_individually(batch, fetch_start, fetch_end))
+
+            done += len(batch)
+            if progress_callback:
+                progress_callback(done / total * 100)
+
+    # Cached rows come back ordered by date; downloads are sorted here if needed
+    for ticker, hist in fetched.items():
+        if not hist.index.is_monotonic_increasing:
+            fetched[ticker] = hist.sort_index()
+
+    if fetched:
         try:
-            stock = yf.Ticker(ticker)
-            hist = stock.history(start=start_date, end=end_date)
-            if not hist.empty:
-                # Remove timezone info from index for consistent comparisons
-                hist.index = hist.index.tz_localize(None)
-                data[ticker] = hist
+            store_prices(fetched, windows)
         except Exception as e:
-            print(f"Error fetching {ticker}: {e}")
+            print(f"Error caching prices: {e}")
+
+    # Downloads widened to extend a cached span are cut back to this window
+    window_start = pd.Timestamp(start_day)
+    window_end = pd.Timestamp(end_day)
+    for ticker, hist in fetched.items():
+        if windows[ticker] != (start_day, end_day):
+            days = hist.index.normalize()
+            hist = hist[(days >= window_start) & (days < window_end)]
+            if hist.empty:
+                continue
+        data[ticker] = hist
+    return data
 
-        if progress_callback and i % 10 == 0:
-            progress_callback(i / total * 100)
 
+def download_batch(
+    tickers: List[str],
+    start_date: datetime,
+    end_date: datetime
+) -> Dict[str, pd.DataFrame]:
+    """
+    Download OHLC history for several tickers in one yf.download call.
+    Returns dict of {ticker: DataFrame} for the tickers that had any bars.
+    """
+    # auto_adjust=True: adjusted prices, as Ticker.history returns them
+    raw = yf.download(
+        tickers=tickers,
+        start=start_date,
+        end=end_date,
+        group_by='ticker',
+        auto_adjust=True,
+        threads=True,
+        progress=False,
+    )
+    if raw is None or raw.empty:
+        return {}
+
+    data = {}
+    grouped = isinstance(raw.columns, pd.MultiIndex)
+    for ticker in tickers:
+        if grouped and ticker not in raw.columns.get_level_values(0):
+            continue
+        # Rows are the union of every ticker's dates; drop the ones this ticker lacks
+        hist = (raw[ticker] if grouped else raw).dropna(how='all')
+        if not hist.empty:
+            # Remove timezone info from index for consistent comparisons
+            if hist.index.tz is not None:
+                hist.index = hist.index.tz_localize(None)
+            data[ticker] = hist
     return data
 
 
+def _fetch_one(ticker: str, start_date: datetime, end_date: datetime) -> tuple:
+    """(ticker, DataFrame of its OHLC history, or None if unavailable)"""
+    try:
+        hist = yf.Ticker(ticker).history(start=start_date, end=end_date)
+        if hist.empty:
+            return ticker, None
+        # Remove timezone info from index for consistent comparisons
+        hist.index = hist.index.tz_localize(None)
+        return ticker, hist
+    except Exception as e:
+        print(f"Error fetching {ticker}: {e}")
+        return ticker, None
+
+
+def fetch_individually(
+    tickers: List[str],
+    start_date: datetime,
+    end_date: datetime
+) -> Dict[str, pd.DataFrame]:
+    """
+    Fetch OHLC history one request per ticker, FALLBACK_FETCH_WORKERS at a time;
+    the requests wait on the network, so threads overlap them.
+    """
+    data = {}
+    with ThreadPoolExecutor(max_workers=FALLBACK_FETCH_WORKERS) as executor:
+        futures = [executor.submit(_fetch_one, ticker, start_date, end_date) for ticker in tickers]
+        for future in as_completed(futures):
+            ticker, hist = future.result()
+            if hist is not None:
+                data[ticker] = hist
+    return data
+
+
+def load_cached_prices(
+    tickers: List[str],
+    start_date: datetime,
+    end_date: datetime
+) -> Dict[str, pd.DataFrame]:
+    """
+    Read cached OHLC history for several tickers from the price_cache table,
+    for bars on or after start_date and before end_date.
+    Returns dict of {ticker: DataFrame with OHLC data}, shaped like fetch_stock_data.
+    """
+    # Date column: compare against dates, not datetimes
+    start_day = pd.Timestamp(start_date).date()
+    end_day = pd.Timestamp(end_date).date()
+    query = (
+        select(
+            PriceCache.ticker,
+            PriceCache.date,
+            PriceCache.open_price.label('Open'),
+            PriceCache.high_price.label('High'),
+            PriceCache.low_price.label('Low'),
+            PriceCache.close_price.label('Close'),
+            PriceCache.volume.label('Volume'),
+        )
+        # End-exclusive, like yf.download's end, so a cached window has the same bars
+        # as a fresh download of it; ticker IN (...) AND a date range is served
+        # by ix_pricecache_ticker_date
+        .where(PriceCache.ticker.in_(tickers), PriceCache.date >= start_day, PriceCache.date < end_day)
+        .order_by(PriceCache.ticker, PriceCache.date)
+    )
+    with sync_engine.connect() as conn:
+        # float64, as downloaded, so cached runs reproduce fresh ones exactly.
+        # price_cache.volume is nullable (bars with a price but no volume), so
+        # it is read as nullable Int64 rather than int64, which can't hold NULL
+        df = pd.read_sql(
+            query,
+            conn,
+            parse_dates=['date'],
+            dtype={'Open': 'float64', 'High': 'float64', 'Low': 'float64', 'Close': 'float64', 'Volume': 'Int64'},
+        )
+
+    df['ticker'] = df['ticker'].astype('category')
+    return {
+        ticker: group.drop(columns='ticker').set_index('date')
+        for ticker, group in df.groupby('ticker', observed=True)
+    }
+
+
 def fetch_spy_data(start_date: datetime, end_date: datetime) -> pd.DataFrame:
-    """Fetch SPY data for comparison"""
-    spy = yf.Ticker("SPY")
-    hist = spy.history(start=start_date, end=end_date)
-    # Remove timezone info from index for consistent comparisons
-    hist.index = hist.index.tz_localize(None)
-    return hist
+    """Fetch SPY data for comparison, through the same price cache"""
+    return fetch_stock_data(["SPY"], start_date, end_date).get("SPY", pd.DataFrame())
+
+
+def build_price_panel(data: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    """
+    Align every ticker's Open and Close on one shared date index.
+    Returns {'open', 'close', 'loss'} DataFrames, each dates x tickers (float64),
+    where 'loss' is the intraday % change for every ticker and day, computed once
+    so each day's losers are a single row read. 'masks' starts empty and caches
+    get_biggest_losers' column mask per constituent set.
+    """
+    # float64, as downloaded: the % change is stored and reported per pick, and
+    # float32 prices shift it in the 4th decimal and can reorder near ties
+    opens = pd.DataFrame({symbol: df['Open'] for symbol, df in data.items()}, dtype=np.float64)
+    closes = pd.DataFrame({symbol: df['Close'] for symbol, df in data.items()}, dtype=np.float64)
+    # Match on calendar day, like the per-ticker idx.date() comparison did
+    index = pd.DatetimeIndex(opens.index).normalize()
+    opens.index = index
+    closes.index = index
+
+    # NaN (no bar) and non-positive opens have no % change
+    loss = (closes - opens) / opens.where(opens > 0) * 100
+    return {'open': opens, 'close': closes, 'loss': loss, 'masks': {}}
+
+
+def _eligible_mask(panel: Dict, eligible_tickers) -> np.ndarray:
+    """
+    Boolean mask of the panel's columns in eligible_tickers.
+    Constituents change a few times a year and come back as the same frozenset,
+    so each set's mask is built once per panel.
+    """
+    tickers = panel['loss'].columns
+    if not isinstance(eligible_tickers, frozenset):
+        return tickers.isin(list(eligible_tickers))
+
+    masks = panel.setdefault('masks', {})
+    mask = masks.get(eligible_tickers)
+    if mask is None:
+        mask = masks[eligible_tickers] = tickers.isin(list(eligible_tickers))
+    return mask
+
+
+@njit(cache=True)
+def _top_losers(pct, eligible, top_n):
+    """
+    Column positions of the top_n smallest non-NaN eligible values, ascending.
+    Ties keep column order (as a stable sort would). One pass with a small
+    insertion-sorted buffer.
+    """
+    best = np.empty(top_n, dtype=np.int64)
+    count = 0
+    for j in range(pct.shape[0]):
+        value = pct[j]
+        if not eligible[j] or np.isnan(value):
+            continue
+
+        # Slot after every kept value <= this one
+        k = count
+        while k > 0 and pct[best[k - 1]] > value:
+            k -= 1
+        if k == top_n:
+            continue
+
+        # Shift the larger values down a slot, dropping the last if full
+        for m in range(min(count, top_n - 1), k, -1):
+            best[m] = best[m - 1]
+        best[k] = j
+        if count < top_n:
+            count += 1
+    return best[:count]
 
 
 def get_biggest_losers(
-    data: Dict[str, pd.DataFrame],
+    panel: Dict[str, pd.DataFrame],
     date: datetime,
     eligible_tickers: Optional[Set[str]] = None,
     top_n: int = 5
 ) -> List[Dict]:
     """
     Find the top N biggest losers (by intraday % change) for a given date.
+    panel is the output of build_price_panel().
     Only considers tickers in the eligible_tickers set (if provided).
     Returns list of dicts with ticker and percentage change.
     """
-    daily_changes = []
-    target_date = date.date() if hasattr(date, 'date') else date
+    target_date = pd.Timestamp(date).normalize()
+    loss_df = panel['loss']
+    try:
+        row = loss_df.index.get_loc(target_date)
+    except KeyError:
+        return []
 
-    for symbol, df in data.items():
-        # Skip if not in eligible tickers for this date
-        if eligible_tickers and symbol not in eligible_tickers:
-            continue
+    # One row of the panel as a plain array; pandas selection costs more than the work here
+    pct = loss_df.to_numpy()[row]
+    tickers = loss_df.columns
 
-        # Find matching date in index
-        for idx in df.index:
-            if idx.date() == target_date:
-                try:
-                    open_price = df.loc[idx, 'Open']
-                    close_price = df.loc[idx, 'Close']
-                    if pd.notna(open_price) and pd.notna(close_price) and open_price > 0:
-                        pct_change = (close_price - open_price) / open_price * 100
-                        daily_changes.append({
-                            'ticker': symbol,
-                            'pct_change': pct_change
-                        })
-                except (KeyError, TypeError):
-                    pass
-                break  # Found the date, move to next symbol
-
-    # Sort by percentage change (ascending = biggest losses first)
-    daily_changes.sort(key=lambda x: x['pct_change'])
+    # Skip tickers not in the eligible set for this date (the kernel skips NaN)
+    if eligible_tickers:
+        eligible = _eligible_mask(panel, eligible_tickers)
+    else:
+        eligible = np.ones(len(tickers), dtype=np.bool_)
+
+    # Compiled single pass; ties keep column order (as Series.nsmallest does)
+    losers = _top_losers(pct, eligible, top_n)
 
     # Return top N with ranking
-    result = []
-    for i, item in enumerate(daily_changes[:top_n]):
-        result.append({
-            'ticker': item['ticker'],
-            'daily_loss_pct': item['pct_change'],
+    return [
+        {
+            'ticker': tickers[j],
+            'daily_loss_pct': float(pct[j]),
             'ranking': i + 1
-        })
+        }
+        for i, j in enumerate(losers)
+    ]
+
 
-    return result
+@njit(parallel=True, cache=True)
+def _top_losers_rows(loss, rows, masks, mask_ids, top_n):
+    """
+    _top_losers for many days at once, spread over cores. Row i of the result
+    holds the column positions for loss[rows[i]] under masks[mask_ids[i]],
+    padded with -1; days with rows[i] < 0 (no bar) stay all -1.
+    """
+    out = np.full((rows.shape[0], top_n), -1, dtype=np.int64)
+    for i in prange(rows.shape[0]):
+        if rows[i] < 0:
+            continue
+        picked = _top_losers(loss[rows[i]], masks[mask_ids[i]], top_n)
+        for k in range(picked.shape[0]):
+            out[i, k] = picked[k]
+    return out
+
+
+def get_biggest_losers_batch(
+    panel: Dict[str, pd.DataFrame],
+    dates: List[datetime],
+    eligible_sets: List[Optional[Set[str]]],
+    top_n: int = 5
+) -> List[List[Dict]]:
+    """
+    get_biggest_losers for many dates in one compiled, parallel pass.
+    eligible_sets[i] applies to dates[i]; returns one list of losers per date.
+    """
+    loss_df = panel['loss']
+    tickers = loss_df.columns
+    # Row-major copy so each day's row is contiguous for the kernel
+    loss = np.ascontiguousarray(loss_df.to_numpy())
+    rows = loss_df.index.get_indexer(pd.DatetimeIndex(dates).normalize()).astype(np.int64)
+
+    # One mask per distinct constituent set; no set means every ticker
+    mask_list = [np.ones(len(tickers), dtype=np.bool_)]
+    mask_ids = np.zeros(len(dates), dtype=np.int64)
+    set_ids = {}
+    for i, eligible_tickers in enumerate(eligible_sets):
+        if not eligible_tickers:
+            continue
+        key = eligible_tickers if isinstance(eligible_tickers, frozenset) else frozenset(eligible_tickers)
+        if key not in set_ids:
+            set_ids[key] = len(mask_list)
+            mask_list.append(_eligible_mask(panel, key))
+        mask_ids[i] = set_ids[key]
+
+    picked = _top_losers_rows(loss, rows, np.stack(mask_list), mask_ids, top_n)
+
+    return [
+        [
+            {
+                'ticker': tickers[j],
+                'daily_loss_pct': float(loss[row, j]),
+                'ranking': k + 1
+            }
+            for k, j in enumerate(day_picks) if j >= 0
+        ]
+        for row, day_picks in zip(rows, picked)
+    ]
+
+
+def _next_trading_pos(index: pd.DatetimeIndex, date: datetime) -> int:
+    """Position of the first bar after the given date's day; len(index) if none"""
+    # First bar on or after the following midnight: a binary search of the sorted index
+    next_day = pd.Timestamp(date).normalize() + pd.Timedelta(days=1)
+    return index.searchsorted(next_day, side='left')
 
 
 def get_next_trading_day(df: pd.DataFrame, date: datetime) -> Optional[datetime]:
     """Find the next trading day after the given date"""
-    target_date = date.date() if hasattr(date, 'date') else date
-    for idx in df.index:
-        if idx.date() > target_date:
-            return idx
-    return None
+    pos = _next_trading_pos(df.index, date)
+    if pos == len(df.index):
+        return None
+    return df.index[pos]
 
 
-def calculate_return(
+def build_forward_returns(
     data: Dict[str, pd.DataFrame],
+    hold_years: List[int]
+) -> Dict[str, Dict]:
+    """
+    Precompute, per ticker, the N-year return for buying at OPEN on every bar.
+
+    Each entry holds the ticker's 'dates' and 'open' arrays plus one return
+    array per hold period (NaN where the return is undefined), so
+    calculate_return becomes a searchsorted and an array read.
+    """
+    tables = {}
+    for symbol, df in data.items():
+        dates = df.index.normalize().values
+        opens = df['Open'].to_numpy(dtype=np.float64)
+        closes = df['Close'].to_numpy(dtype=np.float64)
+        table = {'dates': dates, 'open': opens}
+
+        for years in hold_years:
+            # Target sell date N years after each purchase bar
+            target = dates + np.timedelta64(365 * years, 'D')
+
+            # Only targets within the data have a return
+            ret = np.full(len(dates), np.nan)
+            end = np.searchsorted(dates, target)
+            ok = end < len(dates)
+            end, target = end[ok], target[ok]
+
+            # Closest date to the target; on a tie the earlier day wins
+            before = end - 1
+            use_before = (dates[end] != target) & (target - dates[before] <= dates[end] - target)
+            sell = np.where(use_before, before, end)
+
+            # Purchase at OPEN, sell at CLOSE; missing or non-positive prices stay NaN
+            buy_price = opens[ok]
+            sell_price = closes[sell]
+            valid = (buy_price > 0) & (sell_price > 0)
+            ret[np.flatnonzero(ok)[valid]] = (sell_price[valid] - buy_price[valid]) / buy_price[valid] * 100
+            table[years] = ret
+
+        tables[symbol] = table
+    return tables
+
+
+def calculate_return(
+    forward_returns: Dict[str, Dict],
     ticker: str,
     loser_date: datetime,
     hold_years: int
 ) -> tuple:
     """
     Calculate the return for a stock purchased the day AFTER it was identified as a loser.
+    forward_returns is the output of build_forward_returns().
 
     The strategy is:
     1. Stock is identified as biggest loser on Day X (loser_date)
@@ -243,53 +706,68 @@ def calculate_return(
     Returns:
         tuple: (return_percentage, purchase_date, purchase_price) or (None, None, None)
     """
-    if ticker not in data:
+    table = forward_returns.get(ticker)
+    if table is None or hold_years not in table:
         return None, None, None
 
-    df = data[ticker]
-
-    try:
-        # Find the next trading day after the loser was identified
-        purchase_date = get_next_trading_day(df, loser_date)
-        if purchase_date is None:
-            return None, None, None
-
-        # Purchase at OPEN price on the day after the loss
-        purchase_price = df.loc[purchase_date, 'Open']
+    # Next trading day after the loser was identified
+    dates = table['dates']
+    i = np.searchsorted(dates, np.datetime64(pd.Timestamp(loser_date).normalize()), side='right')
+    if i == len(dates):
+        return None, None, None
 
-        if pd.isna(purchase_price) or purchase_price <= 0:
-            return None, None, None
+    return_pct = table[hold_years][i]
+    if np.isnan(return_pct):
+        return None, None, None
+    return float(return_pct), pd.Timestamp(dates[i]), table['open'][i]
 
-        # Calculate target sell date (N years from purchase)
-        target_end_date = purchase_date + timedelta(days=365 * hold_years)
 
-        # Check if we have enough data
-        if target_end_date > df.index[-1]:
-            return None, None, None
+def calculate_returns_batch(
+    forward_returns: Dict[str, Dict],
+    tickers: List[str],
+    loser_dates: List[datetime],
+    hold_years: List[int]
+) -> tuple:
+    """
+    calculate_return for many picks at once: one searchsorted per ticker over
+    all of its loser dates. tickers[i] and loser_dates[i] describe pick i.
 
-        # Find the closest date in the index to our target
-        best_idx = None
-        best_diff = None
-        for idx in df.index:
-            diff = abs((idx - target_end_date).days)
-            if best_diff is None or diff < best_diff:
-                best_diff = diff
-                best_idx = idx
+    Returns ({years: return array}, purchase date array, purchase price array),
+    aligned with the picks. A return is NaN where calculate_return would return
+    None; purchase dates (NaT if none) and prices are filled wherever a next
+    trading day exists.
+    """
+    n = len(tickers)
+    returns = {years: np.full(n, np.nan) for years in hold_years}
+    purchase_dates = np.full(n, np.datetime64('NaT'), dtype='datetime64[D]')
+    purchase_prices = np.full(n, np.nan)
+    if n == 0:
+        return returns, purchase_dates, purchase_prices
+
+    days = pd.DatetimeIndex(loser_dates).normalize().values
+    positions_by_ticker: Dict[str, List[int]] = {}
+    for i, ticker in enumerate(tickers):
+        positions_by_ticker.setdefault(ticker, []).append(i)
 
-        if best_idx is None:
-            return None, None, None
+    for ticker, positions in positions_by_ticker.items():
+        table = forward_returns.get(ticker)
+        if table is None:
+            continue
 
-        # Sell at CLOSE price
-        sell_price = df.loc[best_idx, 'Close']
+        # Next trading day after each loser date
+        dates = table['dates']
+        positions = np.asarray(positions)
+        buy = np.searchsorted(dates, days[positions].astype(dates.dtype), side='right')
+        has_buy = buy < len(dates)
+        positions, buy = positions[has_buy], buy[has_buy]
 
-        if pd.notna(sell_price) and sell_price > 0:
-            return_pct = (sell_price - purchase_price) / purchase_price * 100
-            return return_pct, purchase_date, purchase_price
-        return None, None, None
+        purchase_dates[positions] = dates[buy]
+        purchase_prices[positions] = table['open'][buy]
+        for years in hold_years:
+            if years in table:
+                returns[years][positions] = table[years][buy]
 
-    except Exception as e:
-        print(f"Error calculating return for {ticker}: {e}")
-        return None, None, None
+    return returns, purchase_dates, purchase_prices
 
 
 def calculate_spy_return(
@@ -304,13 +782,17 @@ def calculate_spy_return(
     sell at CLOSE N years later.
     """
     try:
+        # Rows are found by binary search and read by position (iat), skipping label lookups
+        index = spy_data.index
+
         # Find the next trading day after the loser was identified
-        purchase_date = get_next_trading_day(spy_data, loser_date)
-        if purchase_date is None:
+        buy_pos = _next_trading_pos(index, loser_date)
+        if buy_pos == len(index):
             return None
+        purchase_date = index[buy_pos]
 
         # Purchase at OPEN price
-        purchase_price = spy_data.loc[purchase_date, 'Open']
+        purchase_price = spy_data.iat[buy_pos, spy_data.columns.get_loc('Open')]
 
         if pd.isna(purchase_price) or purchase_price <= 0:
             return None
@@ -319,17 +801,12 @@ def calculate_spy_return(
         target_end_date = purchase_date + timedelta(days=365 * hold_years)
 
         # Find the first available date on or after target
-        sell_idx = None
-        for idx in spy_data.index:
-            if idx >= target_end_date:
-                sell_idx = idx
-                break
-
-        if sell_idx is None:
+        sell_pos = index.searchsorted(target_end_date, side='left')
+        if sell_pos == len(index):
             return None
 
         # Sell at CLOSE price
-        sell_price = spy_data.loc[sell_idx, 'Close']
+        sell_price = spy_data.iat[sell_pos, spy_data.columns.get_loc('Close')]
 
         if pd.notna(sell_price) and sell_price > 0:
             return (sell_price - purchase_price) / purchase_price * 100
@@ -338,3 +815,41 @@ def calculate_spy_return(
     except Exception as e:
         print(f"Error calculating SPY return: {e}")
         return None
+
+
+def calculate_spy_returns_batch(
+    spy_data: pd.DataFrame,
+    loser_dates,
+    hold_years: int
+) -> np.ndarray:
+    """
+    calculate_spy_return for many loser dates at once: one binary search for
+    every purchase day and one for every sell day, then array reads.
+    Returns a float array aligned with loser_dates, NaN where
+    calculate_spy_return would return None.
+    """
+    returns = np.full(len(loser_dates), np.nan)
+    if spy_data.empty or len(loser_dates) == 0:
+        return returns
+
+    index = spy_data.index
+    opens = spy_data['Open'].to_numpy(dtype=np.float64)
+    closes = spy_data['Close'].to_numpy(dtype=np.float64)
+
+    # Buy at OPEN on the first bar after each loser date
+    next_days = pd.DatetimeIndex(loser_dates).normalize() + pd.Timedelta(days=1)
+    buy = index.searchsorted(next_days, side='left')
+    has_buy = np.flatnonzero(buy < len(index))
+    buy = buy[has_buy]
+
+    # Sell at CLOSE on the first bar on or after N years later
+    sell = index.searchsorted(index[buy] + pd.Timedelta(days=365 * hold_years), side='left')
+    has_sell = sell < len(index)
+    rows, buy, sell = has_buy[has_sell], buy[has_sell], sell[has_sell]
+
+    # Missing or non-positive prices have no return
+    buy_price = opens[buy]
+    sell_price = closes[sell]
+    valid = (buy_price > 0) & (sell_price > 0)
+    returns[rows[valid]] = (sell_price[valid] - buy_price[valid]) / buy_price[valid] * 100
+    return returns
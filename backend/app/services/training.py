@@ -1,24 +1,47 @@
 """
 Training service for analyzing biggest loser patterns and discovering optimal scoring weights.
 """
+import re
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Union
 from scipy import stats
 import json
 
 from app.services.stock_data import (
-    sp500_historical,
+    get_sp500_eligible_set,
     load_stock_metadata,
     fetch_stock_data,
     fetch_spy_data,
-    get_biggest_losers,
-    calculate_return,
-    calculate_spy_return,
+    build_price_panel,
+    get_biggest_losers_batch,
+    build_forward_returns,
+    calculate_returns_batch,
+    calculate_spy_returns_batch,
     get_all_historical_tickers
 )
-from app.services.scoring import calculate_confidence_score, DEFAULT_WEIGHTS
+from app.services.scoring import DEFAULT_WEIGHTS
+from app.services.scoring_jit import calculate_confidence_scores_batch, score_picks
+
+
+# Industry keyword groups used by the factor analysis, matched case-insensitively.
+# Each group is one bit of an industry's sector code, so a pick's groups are
+# tested with a bitwise AND instead of a regex scan per row.
+SECTOR_PATTERNS = {
+    'tech_health': re.compile(r'technology|healthcare|software', re.IGNORECASE),
+    'reit_keyword': re.compile(r'reit', re.IGNORECASE),
+    'tech_sector': re.compile(r'technology|software|semiconductor', re.IGNORECASE),
+    'healthcare_sector': re.compile(r'healthcare|pharmaceutical|biotech', re.IGNORECASE),
+    'financial_sector': re.compile(r'financial|bank|insurance', re.IGNORECASE),
+    'consumer_sector': re.compile(r'consumer|retail', re.IGNORECASE),
+    'energy_sector': re.compile(r'energy|oil|gas', re.IGNORECASE),
+    'industrial_sector': re.compile(r'industrial|manufacturing', re.IGNORECASE),
+    'is_reit': re.compile(r'reit|real estate', re.IGNORECASE),
+    'communications': re.compile(r'communication|telecom|media', re.IGNORECASE),
+    'utilities': re.compile(r'utilities|utility', re.IGNORECASE),
+}
+SECTOR_BITS = {name: 1 << bit for bit, name in enumerate(SECTOR_PATTERNS)}
 
 
 def run_training_analysis(
@@ -41,7 +64,7 @@ def run_training_analysis(
     current_year = start_date.year
     while current_year <= end_date.year:
         year_start = datetime(current_year, 1, 1)
-        tickers_for_year = sp500_historical.get_tickers_for_date(year_start)
+        tickers_for_year = get_sp500_eligible_set(year_start)
         relevant_tickers.update(tickers_for_year)
         current_year += 1
 
@@ -67,72 +90,95 @@ def run_training_analysis(
 
     spy_data = fetch_spy_data(start_date - timedelta(days=7), data_end_date)
 
+    # Dates x tickers Open/Close panel with the daily % change precomputed,
+    # so each day's losers are a single row read
+    price_panel = build_price_panel(stock_data)
+    # Per-ticker N-year returns for every purchase day, looked up per pick below
+    forward_returns = build_forward_returns(stock_data, hold_years)
+
     # Get trading days from SPY
     trading_days = [d for d in spy_data.index if start_date <= d <= end_date]
     total_days = len(trading_days)
 
+    # SPY's N-year return for every trading day, computed in one pass per hold period
+    spy_returns = {years: calculate_spy_returns_batch(spy_data, trading_days, years) for years in hold_years}
+
     if progress_callback:
         progress_callback(45, f"Analyzing {total_days} trading days...")
 
-    # Collect all picks
-    picks = []
-
-    for i, date in enumerate(trading_days):
-        # Get S&P 500 constituents for this date
-        eligible_tickers = sp500_historical.get_tickers_for_date(date.to_pydatetime())
-
-        # Find biggest losers
-        losers = get_biggest_losers(stock_data, date, eligible_tickers, top_n=5)
-
+    # Biggest losers among each date's S&P 500 constituents, every day in one parallel pass
+    eligible_sets = [get_sp500_eligible_set(date.to_pydatetime()) for date in trading_days]
+    day_losers = get_biggest_losers_batch(price_panel, trading_days, eligible_sets, top_n=5)
+
+    # Picks are collected column by column, one array per field, and turned
+    # into per-pick dicts only once every field is computed
+    n_picks = sum(len(losers) for losers in day_losers)
+    pick_days = np.empty(n_picks, dtype=np.int64)
+    tickers = []
+    daily_losses = np.empty(n_picks)  # Unrounded; feeds the confidence scores
+    rankings = np.empty(n_picks, dtype=np.int64)
+    loser_days = [date.strftime('%Y-%m-%d') for date in trading_days]  # Formatted once per day
+
+    p = 0
+    for i, losers in enumerate(day_losers):
         for loser in losers:
-            ticker = loser['ticker']
-            meta = metadata.get(ticker, {'industry': 'unknown', 'dividend_yield': 0.0, 'volume': 0})
-
-            pick = {
-                'loser_date': date.strftime('%Y-%m-%d'),  # Day stock was identified as loser
-                'ticker': ticker,
-                'daily_loss_pct': round(loser['daily_loss_pct'], 4),
-                'ranking': loser['ranking'],
-                'industry': meta['industry'],
-                'dividend_yield': meta['dividend_yield'],
-                'volume': meta['volume'],
-            }
+            pick_days[p] = i
+            tickers.append(loser['ticker'])
+            daily_losses[p] = loser['daily_loss_pct']
+            rankings[p] = loser['ranking']
+            p += 1
 
-            # Calculate returns for each hold period
-            # Note: calculate_return now returns (return_pct, purchase_date, purchase_price)
-            # Purchase happens at OPEN the day AFTER the loser was identified
-            for years in hold_years:
-                ret, purchase_date, purchase_price = calculate_return(stock_data, ticker, date, years)
-                spy_ret = calculate_spy_return(spy_data, date, years)
-                pick[f'return_{years}y'] = round(ret, 4) if ret is not None else None
-                pick[f'spy_return_{years}y'] = round(spy_ret, 4) if spy_ret is not None else None
-
-            # Store purchase date (same for all hold periods since it's the day after loser_date)
-            if purchase_date is not None:
-                pick['purchase_date'] = purchase_date.strftime('%Y-%m-%d')
-                pick['purchase_price'] = round(purchase_price, 4) if purchase_price else None
-
-            # Calculate confidence score using default weights
-            pick['confidence_score'] = calculate_confidence_score(
-                ticker,
-                loser['daily_loss_pct'],
-                loser['ranking'],
-                meta['industry'],
-                meta['dividend_yield'],
-                meta['volume']
-            )
-
-            picks.append(pick)
-
-        if progress_callback and i % 50 == 0:
-            progress = 45 + (i / total_days * 45)
-            progress_callback(progress, f"Processing day {i+1}/{total_days}")
+    # Progress is reported between the batched stages rather than per day
+    if progress_callback:
+        progress_callback(70, f"Calculating returns for {n_picks} picks...")
+
+    # Metadata is looked up once per distinct ticker and spread to the picks by ticker code
+    ticker_codes, unique_tickers = pd.factorize(np.array(tickers, dtype=object))
+    default_meta = {'industry': 'unknown', 'dividend_yield': 0.0, 'volume': 0}
+    unique_meta = [metadata.get(ticker, default_meta) for ticker in unique_tickers]
+    industries = np.array([meta['industry'] for meta in unique_meta], dtype=object)[ticker_codes]
+    dividend_yields = np.array([meta['dividend_yield'] for meta in unique_meta], dtype=np.float64)[ticker_codes]
+    volumes = np.array([meta['volume'] for meta in unique_meta], dtype=np.int64)[ticker_codes]
+
+    # Returns for each hold period, every pick in one lookup per ticker.
+    # Purchase happens at OPEN the day AFTER the loser was identified
+    stock_returns, purchase_dates, purchase_prices = calculate_returns_batch(
+        forward_returns,
+        tickers,
+        [trading_days[day] for day in pick_days.tolist()],
+        hold_years
+    )
+
+    # Confidence scores using default weights, every pick in one compiled pass
+    scores = calculate_confidence_scores_batch(daily_losses, rankings, industries, dividend_yields, volumes)
+
+    columns = {
+        'loser_date': [loser_days[day] for day in pick_days.tolist()],  # Day stock was identified as loser
+        'ticker': tickers,
+        'daily_loss_pct': rounded(daily_losses),
+        'ranking': rankings.tolist(),
+        'industry': industries.tolist(),
+        'dividend_yield': dividend_yields.tolist(),
+        'volume': volumes.tolist(),
+    }
+    for years in hold_years:
+        columns[f'return_{years}y'] = rounded(stock_returns[years])
+        columns[f'spy_return_{years}y'] = rounded(spy_returns[years][pick_days])
+    # Purchase date is the same for all hold periods since it's the day after loser_date
+    columns['purchase_date'] = np.datetime_as_string(purchase_dates, unit='D').tolist()
+    columns['purchase_price'] = [round(price, 4) if price else None for price in purchase_prices.tolist()]
+    columns['confidence_score'] = scores.tolist()
+
+    picks = [dict(zip(columns, values)) for values in zip(*columns.values())]
+    # Purchase details are only recorded when the last hold period has a return
+    for p in np.flatnonzero(np.isnan(stock_returns[hold_years[-1]])).tolist():
+        del picks[p]['purchase_date'], picks[p]['purchase_price']
 
     if progress_callback:
         progress_callback(90, "Analyzing patterns...")
 
-    # Analyze the results
-    analysis = analyze_training_results(picks, hold_years)
+    # Analyze the results, from the columns rather than the pick dicts
+    analysis = analyze_training_results(columns, hold_years)
 
     if progress_callback:
         progress_callback(100, "Complete")
@@ -150,6 +196,11 @@ def run_training_analysis(
     }
 
 
+def rounded(values: np.ndarray) -> List[Optional[float]]:
+    """Values rounded to 4 decimals as a list, with None in place of NaN"""
+    return [round(value, 4) if value == value else None for value in values.tolist()]
+
+
 def convert_numpy_types(obj):
     """Convert numpy types to native Python types for JSON serialization."""
     if isinstance(obj, dict):
@@ -167,14 +218,20 @@ def convert_numpy_types(obj):
     return obj
 
 
-def analyze_training_results(picks: List[Dict], hold_years: List[int]) -> Dict[str, Any]:
+def analyze_training_results(picks: Union[List[Dict], Dict[str, List]], hold_years: List[int]) -> Dict[str, Any]:
     """
     Analyze training results to find patterns and suggest optimal weights.
+    picks is a list of pick dicts or a dict of equal-length pick columns.
     """
-    if not picks:
+    df = pd.DataFrame(picks)
+    if df.empty:
         return {}
 
-    df = pd.DataFrame(picks)
+    # ~100 distinct industries repeated across every pick: categorical codes
+    # shrink the column and let groupby / sector matching work per category
+    df['industry'] = df['industry'].astype('category')
+    # Loser dates are parsed once here, not per hold period
+    df['day_of_week'] = pd.to_datetime(df['loser_date'], format='%Y-%m-%d').dt.day_name()
     analysis = {}
 
     for years in hold_years:
@@ -209,17 +266,13 @@ def analyze_training_results(picks: List[Dict], hold_years: List[int]) -> Dict[s
 
         # Industry breakdown
         analysis[f'{years}y']['by_industry'] = (
-            valid.groupby('industry')[return_col]
-            .agg(['mean', 'count', lambda x: (x > 0).mean() * 100])
-            .rename(columns={'mean': 'avg_return', 'count': 'picks', '<lambda_0>': 'win_rate'})
-            .round(2)
+            group_return_stats(valid, 'industry', return_col)
             .sort_values('avg_return', ascending=False)
             .head(20)
             .to_dict('index')
         )
 
         # Day of week analysis
-        valid['day_of_week'] = pd.to_datetime(valid['loser_date']).dt.day_name()
         analysis[f'{years}y']['by_day'] = (
             valid.groupby('day_of_week')[return_col]
             .agg(['mean', 'count'])
@@ -230,10 +283,7 @@ def analyze_training_results(picks: List[Dict], hold_years: List[int]) -> Dict[s
 
         # Ranking analysis
         analysis[f'{years}y']['by_ranking'] = (
-            valid.groupby('ranking')[return_col]
-            .agg(['mean', 'count', lambda x: (x > 0).mean() * 100])
-            .rename(columns={'mean': 'avg_return', 'count': 'picks', '<lambda_0>': 'win_rate'})
-            .round(2)
+            group_return_stats(valid, 'ranking', return_col)
             .to_dict('index')
         )
 
@@ -244,10 +294,7 @@ def analyze_training_results(picks: List[Dict], hold_years: List[int]) -> Dict[s
             labels=['<-10%', '-10 to -7%', '-7 to -5%', '-5 to -3%', '-3 to 0%']
         )
         analysis[f'{years}y']['by_loss_severity'] = (
-            valid.groupby('loss_bucket', observed=True)[return_col]
-            .agg(['mean', 'count', lambda x: (x > 0).mean() * 100])
-            .rename(columns={'mean': 'avg_return', 'count': 'picks', '<lambda_0>': 'win_rate'})
-            .round(2)
+            group_return_stats(valid, 'loss_bucket', return_col)
             .to_dict('index')
         )
 
@@ -257,52 +304,85 @@ def analyze_training_results(picks: List[Dict], hold_years: List[int]) -> Dict[s
     return convert_numpy_types(analysis)
 
 
-def analyze_factors(df: pd.DataFrame, return_col: str) -> Dict[str, Any]:
+def industry_sector_codes(industry: pd.Series) -> np.ndarray:
     """
-    Analyze how different factors correlate with returns.
+    Bitmask of the SECTOR_PATTERNS each row's industry matches (0 for missing).
+    Each distinct industry is matched once and the result looked up by category code.
     """
-    factors = {}
-    returns = df[return_col].values
+    industry = industry.astype('category')
+    lookup = np.zeros(len(industry.cat.categories) + 1, dtype=np.uint16)
+    for i, name in enumerate(industry.cat.categories):
+        lookup[i] = sum(
+            SECTOR_BITS[sector] for sector, pattern in SECTOR_PATTERNS.items()
+            if pattern.search(str(name))
+        )
+    # Missing industries have code -1, which picks the trailing 0
+    return lookup[industry.cat.codes.to_numpy()]
 
-    # Industry (tech/healthcare vs others)
-    df['is_tech_health'] = df['industry'].str.contains('technology|healthcare|software', case=False, na=False).astype(int)
-    if df['is_tech_health'].nunique() > 1:
-        corr, pval = stats.pointbiserialr(df['is_tech_health'], returns)
-        factors['industry_tech_health'] = {
-            'correlation': round(corr, 4),
-            'p_value': round(pval, 4),
-            'significant': pval < 0.05
-        }
 
-    # Low dividend
-    df['is_low_dividend'] = (df['dividend_yield'] < 1).astype(int)
-    if df['is_low_dividend'].nunique() > 1:
-        corr, pval = stats.pointbiserialr(df['is_low_dividend'], returns)
-        factors['low_dividend'] = {
-            'correlation': round(corr, 4),
-            'p_value': round(pval, 4),
-            'significant': pval < 0.05
-        }
+def group_return_stats(df: pd.DataFrame, by: str, return_col: str) -> pd.DataFrame:
+    """
+    avg_return, picks and win_rate (% of positive returns) per group, rounded.
+    Built-in aggregations only, so no Python function runs per group.
+    """
+    returns = df[return_col]
+    table = (
+        returns.groupby(df[by], observed=True)
+        .agg(['mean', 'count'])
+        .rename(columns={'mean': 'avg_return', 'count': 'picks'})
+    )
+    table['win_rate'] = (returns > 0).groupby(df[by], observed=True).mean() * 100
+    return table.round(2)
 
-    # Non-REIT
-    df['is_non_reit'] = (~df['industry'].str.contains('reit', case=False, na=False)).astype(int)
-    if df['is_non_reit'].nunique() > 1:
-        corr, pval = stats.pointbiserialr(df['is_non_reit'], returns)
-        factors['non_reit'] = {
-            'correlation': round(corr, 4),
-            'p_value': round(pval, 4),
-            'significant': pval < 0.05
-        }
 
-    # High volume
-    df['is_high_volume'] = (df['volume'] > 30_000_000).astype(int)
-    if df['is_high_volume'].nunique() > 1:
-        corr, pval = stats.pointbiserialr(df['is_high_volume'], returns)
-        factors['high_volume'] = {
-            'correlation': round(corr, 4),
-            'p_value': round(pval, 4),
-            'significant': pval < 0.05
-        }
+def point_biserial(indicators: np.ndarray, returns: np.ndarray) -> tuple:
+    """
+    Point-biserial correlation of each 0/1 column of indicators with returns,
+    and its two-sided p-value; same values as stats.pointbiserialr per column.
+    It is Pearson's r, so every column is done in one matrix product.
+    """
+    n = len(returns)
+    x = indicators - indicators.mean(axis=0)
+    y = returns - returns.mean()
+    corrs = (x.T @ y) / np.sqrt((x * x).sum(axis=0) * (y @ y))
+    corrs = np.clip(corrs, -1.0, 1.0)
+
+    # t statistic with n - 2 degrees of freedom; |r| == 1 gives p == 0
+    with np.errstate(divide='ignore'):
+        t = np.abs(corrs) * np.sqrt((n - 2) / (1 - corrs * corrs))
+    pvals = 2 * stats.t.sf(t, n - 2)
+    return corrs, pvals
+
+
+def analyze_factors(df: pd.DataFrame, return_col: str) -> Dict[str, Any]:
+    """
+    Analyze how different factors correlate with returns.
+    """
+    factors = {}
+    returns = df[return_col].values
+    sector_code = industry_sector_codes(df['industry'])
+
+    # 0/1 indicators, correlated with returns together below
+    indicators = {
+        # Industry (tech/healthcare vs others)
+        'industry_tech_health': (sector_code & SECTOR_BITS['tech_health']) != 0,
+        # Low dividend
+        'low_dividend': df['dividend_yield'].to_numpy() < 1,
+        # Non-REIT
+        'non_reit': (sector_code & SECTOR_BITS['reit_keyword']) == 0,
+        # High volume
+        'high_volume': df['volume'].to_numpy() > 30_000_000,
+    }
+    # Indicators that are the same for every pick have no correlation
+    indicators = {name: flags for name, flags in indicators.items() if 0 < flags.sum() < len(flags)}
+    if indicators:
+        corrs, pvals = point_biserial(np.column_stack(list(indicators.values())), returns)
+        for name, corr, pval in zip(indicators, corrs, pvals):
+            factors[name] = {
+                'correlation': round(corr, 4),
+                'p_value': round(pval, 4),
+                'significant': pval < 0.05
+            }
 
     # Loss severity (continuous)
     corr, pval = stats.pearsonr(df['daily_loss_pct'], returns)
@@ -337,13 +417,23 @@ def suggest_optimal_weights(df: pd.DataFrame, return_col: str) -> Dict[str, Any]
     5. Weight by differentiation strength
     """
     returns = df[return_col]
+    df['sector_code'] = industry_sector_codes(df['industry'])
 
     # Define winners (top 25%) and losers (bottom 25%)
     top_threshold = returns.quantile(0.75)
     bottom_threshold = returns.quantile(0.25)
 
-    winners = df[returns >= top_threshold]
-    losers = df[returns <= bottom_threshold]
+    is_winner = (returns >= top_threshold).to_numpy()
+    is_loser = (returns <= bottom_threshold).to_numpy()
+
+    # The conditions below read only these columns, so they run on plain arrays
+    # of the winner and loser rows instead of paying pandas overhead per operation
+    factor_columns = {
+        col: df[col].to_numpy()
+        for col in ('dividend_yield', 'volume', 'daily_loss_pct', 'ranking', 'sector_code')
+    }
+    winners = {col: values[is_winner] for col, values in factor_columns.items()}
+    losers = {col: values[is_loser] for col, values in factor_columns.items()}
 
     # Define factors GROUPED BY CATEGORY
     # We'll only keep the best factor from each category
@@ -377,31 +467,31 @@ def suggest_optimal_weights(df: pd.DataFrame, return_col: str) -> Dict[str, Any]
         },
         # Industries are independent - each can be in the formula
         'tech_sector': {
-            'tech_sector': lambda x: x['industry'].str.contains('technology|software|semiconductor', case=False, na=False),
+            'tech_sector': lambda x: (x['sector_code'] & SECTOR_BITS['tech_sector']) != 0,
         },
         'healthcare_sector': {
-            'healthcare_sector': lambda x: x['industry'].str.contains('healthcare|pharmaceutical|biotech', case=False, na=False),
+            'healthcare_sector': lambda x: (x['sector_code'] & SECTOR_BITS['healthcare_sector']) != 0,
         },
         'financial_sector': {
-            'financial_sector': lambda x: x['industry'].str.contains('financial|bank|insurance', case=False, na=False),
+            'financial_sector': lambda x: (x['sector_code'] & SECTOR_BITS['financial_sector']) != 0,
         },
         'consumer_sector': {
-            'consumer_sector': lambda x: x['industry'].str.contains('consumer|retail', case=False, na=False),
+            'consumer_sector': lambda x: (x['sector_code'] & SECTOR_BITS['consumer_sector']) != 0,
         },
         'energy_sector': {
-            'energy_sector': lambda x: x['industry'].str.contains('energy|oil|gas', case=False, na=False),
+            'energy_sector': lambda x: (x['sector_code'] & SECTOR_BITS['energy_sector']) != 0,
         },
         'industrial_sector': {
-            'industrial_sector': lambda x: x['industry'].str.contains('industrial|manufacturing', case=False, na=False),
+            'industrial_sector': lambda x: (x['sector_code'] & SECTOR_BITS['industrial_sector']) != 0,
         },
         'reit': {
-            'is_reit': lambda x: x['industry'].str.contains('reit|real estate', case=False, na=False),
+            'is_reit': lambda x: (x['sector_code'] & SECTOR_BITS['is_reit']) != 0,
         },
         'communications': {
-            'communications': lambda x: x['industry'].str.contains('communication|telecom|media', case=False, na=False),
+            'communications': lambda x: (x['sector_code'] & SECTOR_BITS['communications']) != 0,
         },
         'utilities': {
-            'utilities': lambda x: x['industry'].str.contains('utilities|utility', case=False, na=False),
+            'utilities': lambda x: (x['sector_code'] & SECTOR_BITS['utilities']) != 0,
         },
     }
 
@@ -490,8 +580,8 @@ def suggest_optimal_weights(df: pd.DataFrame, return_col: str) -> Dict[str, Any]
         'thresholds': {
             'top_25_pct_return': round(float(top_threshold), 1),
             'bottom_25_pct_return': round(float(bottom_threshold), 1),
-            'winners_count': len(winners),
-            'losers_count': len(losers),
+            'winners_count': int(is_winner.sum()),
+            'losers_count': int(is_loser.sum()),
             'min_difference_threshold': 5.0
         }
     }
@@ -510,29 +600,13 @@ def evaluate_model(
     return_col = f'return_{hold_years}y'
     spy_col = f'spy_return_{hold_years}y'
 
-    # Recalculate scores with new weights
-    scored_picks = []
-    for pick in picks:
-        if pick.get(return_col) is None:
-            continue
-
-        score = calculate_confidence_score(
-            pick['ticker'],
-            pick['daily_loss_pct'],
-            pick['ranking'],
-            pick['industry'],
-            pick['dividend_yield'],
-            pick['volume'],
-            weights
-        )
-        pick_copy = pick.copy()
-        pick_copy['new_score'] = score
-        scored_picks.append(pick_copy)
-
+    scored_picks = [pick for pick in picks if pick.get(return_col) is not None]
     if not scored_picks:
         return {'error': 'No valid picks'}
 
+    # Recalculate scores with new weights, all picks in one compiled pass
     df = pd.DataFrame(scored_picks)
+    df['new_score'] = score_picks(scored_picks, weights)
 
     # All picks
     all_returns = df[return_col]
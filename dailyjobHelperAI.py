@@ -1,3 +1,14 @@
+import asyncio
+import calendar
+import hashlib
+import heapq
+import json
+import os
+import random
+import sqlite3
+from contextlib import contextmanager
+
+import numpy as np
 import pandas as pd
 import yfinance as yf
 from datetime import timedelta
@@ -6,11 +17,19 @@ from tqdm import tqdm
 from datetime import datetime
 import pytz  # Import for timezone handling
 import openai
+from openai import AsyncOpenAI, RateLimitError
 from pydantic import BaseModel, Field
+from typing import List
 
 
 openai.api_key = ""
 
+LLM_MODEL = "gpt-4o"
+
+# Scores are deterministic for a given prompt, so they are cached on disk and
+# reruns over the same losers skip the API entirely
+LLM_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "llm_cache.sqlite")
+
 class TicketResolution(BaseModel):
     
 
@@ -19,7 +38,22 @@ class TicketResolution(BaseModel):
     confidence: float = Field(description="Confidence Score based on the Analysis (0-100)")
 
 
-def get_ticket_response_pydantic(ticker, rank, sol):
+class TickerResolution(TicketResolution):
+    ticker: str = Field(description="The stock ticker this score is for, exactly as given.")
+
+
+class BatchResolution(BaseModel):
+    resolutions: List[TickerResolution] = Field(description="One entry per ticker in the request.")
+
+
+# Tickers scored per request, concurrent requests in flight, and retries on
+# rate limiting for batched calls
+BATCH_SIZE = 50
+MAX_CONCURRENT_REQUESTS = 50
+MAX_ATTEMPTS = 3
+
+
+def _ticket_messages(ticker, rank, sol):
     query = f"""
             Provide a quick analysis for the company with the stock ticker: {ticker}. Follow these **exact rules** to calculate a confidence score (0–100) based on weighted criteria. **Output only the final number.**
 
@@ -59,16 +93,166 @@ def get_ticket_response_pydantic(ticker, rank, sol):
     system_prompt = """
         You are a stock analyzer producing a confidence score. 
         """
-    completion = openai.beta.chat.completions.parse(
-        model="gpt-4o",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": query},
-        ],
-        response_format=TicketResolution,
-    )
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": query},
+    ]
+
+
+def _batch_line(ticker, rank, sol):
+    return f"            - {ticker}: rank {rank}, percentage loss {sol}"
+
+
+def _batch_messages(requests):
+    tickers = "\n".join(_batch_line(ticker, rank, sol) for ticker, rank, sol in requests)
+    query = f"""
+            Provide a quick analysis for each company in the list below (stock ticker, its rank among the day's biggest losers, and its percentage loss on the day). For **each ticker**, follow these **exact rules** to calculate a confidence score (0–100) based on weighted criteria.
+
+{tickers}
+
+            1. **Industry (20%)**: Is it either a technology or innovative healthcare company?  
+            - Assign 20% if "Yes"; 0% otherwise.
+
+            2. **International Presence (5%)**: Does the company have significant international revenue?  
+            - Assign 5% if "Yes"; 0% otherwise.
+
+            3. **Growth vs. Blue Chip (15%)**: Is it a growth-oriented company rather than a blue-chip traditional one?  
+            - Assign 15% if "Yes"; 0% otherwise.
+
+            4. **Dividends (20%)**: Is the dividend yield of the stock less than 1%?  
+            - Assign 20% if "Yes"; 0% otherwise.
+
+            5. **REIT (15%)**: Is the stock a Real Estate Investment Trust?  
+            - Assign 15% if "No"; 0% otherwise.
+
+            6. **Severity of Loss (15%)**: Based on the ticker's percentage loss, did the stock lose more than 5% on the day?  
+            - Assign 15% if the absolute value of the percentage loss is greater than 5%; 0% otherwise.
+
+            7. **Ranking Among Biggest Losers (10%)**: Based on the ticker's rank:
+            - Assign 10% if the rank is 1.
+            - Assign 8% if the rank is 2.
+            - Assign 6% if the rank is 3.
+            - Assign 4% if the rank is 4.
+            - Assign 2% if the rank is 5.
+
+            ---
+
+            **Instructions for Output**: 
+            1. Evaluate each criterion above for every ticker and calculate its percentage contribution.
+            2. Add all contributions to produce a total confidence score (0–100) per ticker.
+            3. Return exactly one resolution per ticker in the list.
+            """
+
+    system_prompt = """
+        You are a stock analyzer producing confidence scores. 
+        """
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": query},
+    ]
+
+
+@contextmanager
+def _open_llm_cache():
+    os.makedirs(os.path.dirname(LLM_CACHE_PATH), exist_ok=True)
+    conn = sqlite3.connect(LLM_CACHE_PATH)
+    try:
+        with conn:  # commits on success
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+            )
+            yield conn
+    finally:
+        conn.close()
+
+
+def _cache_key(ticker, rank, sol):
+    # Keyed on the single-ticker prompt the score was answered for
+    prompt = json.dumps(_ticket_messages(ticker, rank, sol))
+    return hashlib.sha256((LLM_MODEL + prompt).encode()).hexdigest()
+
 
-    return completion.choices[0].message.parsed
+def _batch_cache_key(ticker, rank, sol):
+    # Batched scores come from the batch prompt, so they get their own entries:
+    # keyed on that prompt's template (its messages with no tickers) plus this
+    # ticker's line in it, not on the single-ticker prompt
+    prompt = json.dumps(_batch_messages([])) + _batch_line(ticker, rank, sol)
+    return hashlib.sha256((LLM_MODEL + "batch" + prompt).encode()).hexdigest()
+
+
+def get_ticket_response_pydantic(ticker, rank, sol):
+    key = _cache_key(ticker, rank, sol)
+    with _open_llm_cache() as conn:
+        row = conn.execute("SELECT value FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        if row:
+            return TicketResolution.model_validate_json(row[0])
+
+        completion = openai.beta.chat.completions.parse(
+            model=LLM_MODEL,
+            messages=_ticket_messages(ticker, rank, sol),
+            response_format=TicketResolution,
+        )
+        parsed = completion.choices[0].message.parsed
+        conn.execute("INSERT OR REPLACE INTO llm_cache (key, value) VALUES (?, ?)", (key, parsed.model_dump_json()))
+
+    return parsed
+
+
+async def _get_batch_response_async(client, semaphore, requests):
+    async with semaphore:
+        for attempt in range(MAX_ATTEMPTS):
+            try:
+                completion = await client.beta.chat.completions.parse(
+                    model=LLM_MODEL,
+                    messages=_batch_messages(requests),
+                    response_format=BatchResolution,
+                )
+                return completion.choices[0].message.parsed.resolutions
+            except RateLimitError:
+                if attempt == MAX_ATTEMPTS - 1:
+                    raise
+                # Exponential backoff with jitter before retrying
+                await asyncio.sleep(2 ** attempt + random.random())
+
+
+async def _get_ticket_responses_async(requests):
+    client = AsyncOpenAI(api_key=openai.api_key or None)
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    batches = [requests[i:i + BATCH_SIZE] for i in range(0, len(requests), BATCH_SIZE)]
+    return await asyncio.gather(*(_get_batch_response_async(client, semaphore, batch) for batch in batches))
+
+
+def get_ticket_responses_pydantic(requests):
+    """
+    Score many (ticker, rank, sol) requests with one prompt per BATCH_SIZE
+    tickers, sending the batches concurrently. Cached scores are reused and
+    only the misses go to the API. Results come back in the same order as
+    requests; a ticker the model left out comes back as None.
+    """
+    keys = [_batch_cache_key(ticker, rank, sol) for ticker, rank, sol in requests]
+    with _open_llm_cache() as conn:
+        by_ticker = {}
+        misses = []
+        for request, key in zip(requests, keys):
+            row = conn.execute("SELECT value FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row:
+                by_ticker[request[0]] = TickerResolution.model_validate({**json.loads(row[0]), 'ticker': request[0]})
+            else:
+                misses.append((request, key))
+
+        if misses:
+            fetched = {}
+            for resolutions in asyncio.run(_get_ticket_responses_async([request for request, _ in misses])):
+                for resolution in resolutions:
+                    fetched[resolution.ticker] = resolution
+            conn.executemany(
+                "INSERT OR REPLACE INTO llm_cache (key, value) VALUES (?, ?)",
+                [(key, fetched[request[0]].model_dump_json()) for request, key in misses if request[0] in fetched],
+            )
+            by_ticker.update(fetched)
+
+    return [by_ticker.get(ticker) for ticker, _, _ in requests]
 
 def get_biggest_losers(data, date):
     daily_changes = {}
@@ -82,18 +266,20 @@ def get_biggest_losers(data, date):
             
             
     # print(f"Average Loss Of Biggest Loser On Day of Theoretical Purchase: {percentage_changes_average:.2f}%")
-    losers = sorted(daily_changes, key=daily_changes.get)[:5]
+    losers = heapq.nsmallest(5, daily_changes, key=daily_changes.get)
     #AI SECTION
     print(losers)
-    rank = 1
-    for loser in losers:
-        response_pydantic = get_ticket_response_pydantic(loser, rank, daily_changes[loser])
+    # Score all of the day's losers concurrently
+    responses = get_ticket_responses_pydantic(
+        [(loser, rank, daily_changes[loser]) for rank, loser in enumerate(losers, start=1)]
+    )
+    for loser, response_pydantic in zip(losers, responses):
         print(loser)
         # print(daily_changes[loser])
-        print(response_pydantic.model_dump())
+        if response_pydantic is not None:
+            print(response_pydantic.model_dump())
         
         # validation_result = validate_ticker_with_ai(loser, rank)
-        rank = rank + 1
         # print(loser)
         # print(validation_result)
     return losers, percentage_change
@@ -144,8 +330,12 @@ def analyze_results(df_results, sd, ed):
     
 
     # Trend Analysis: Day of the Week
-    df_results['day_of_week'] = df_results['date'].dt.day_name()
-    day_of_week_trends = df_results.groupby('day_of_week')['return_2y'].mean()
+    # Categorical built straight from the weekday codes: groupby runs on the
+    # int codes instead of hashing a day-name string per row
+    df_results['day_of_week'] = pd.Categorical.from_codes(
+        df_results['date'].dt.dayofweek, categories=list(calendar.day_name)
+    )
+    day_of_week_trends = df_results.groupby('day_of_week', observed=True)['return_2y'].mean()
     
     print("Day of the Week Trends:", day_of_week_trends)
 
@@ -155,19 +345,17 @@ def analyze_results(df_results, sd, ed):
     try:
         spy = yf.Ticker("SPY")
         spy_data = spy.history(start=sd, end=ed)  # Use the same time window
-        spy_data['2y_return'] = None  # Initialize column
-
-        # Calculate 2-year returns for each day
-        for i in range(len(spy_data)):
-            start_price = spy_data['Close'].iloc[i]
-            start_date = spy_data.index[i]
-            end_date = start_date + timedelta(days=365*2)
-
-            # Find the closest available date within the 2-year window
-            end_prices = spy_data[spy_data.index >= end_date]['Close']
-            if not end_prices.empty:
-                end_price = end_prices.iloc[0]
-                spy_data.at[start_date, '2y_return'] = (end_price - start_price) / start_price * 100
+        # Calculate 2-year returns for each day: locate every window's end
+        # (first trading day on or after start + 2 years) with one searchsorted
+        idx_ns = spy_data.index.values.astype('datetime64[ns]')
+        end_pos = np.searchsorted(idx_ns, idx_ns + np.timedelta64(365*2, 'D'), side='left')
+        valid = end_pos < len(idx_ns)
+
+        close = spy_data['Close'].to_numpy(dtype=np.float64)
+        out = np.full(len(idx_ns), np.nan, dtype=np.float64)
+        out[valid] = (close[end_pos[valid]] - close[valid]) / close[valid] * 100
+
+        spy_data['2y_return'] = out
 
         # Filter out any days without a valid 2-year return
         valid_returns = spy_data['2y_return'].dropna()
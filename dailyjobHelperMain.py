@@ -1,3 +1,7 @@
+import calendar
+import heapq
+
+import numpy as np
 import pandas as pd
 import yfinance as yf
 from datetime import timedelta
@@ -96,7 +100,7 @@ def get_biggest_losers(data, date):
             
             
     # print(f"Average Loss Of Biggest Loser On Day of Theoretical Purchase: {percentage_changes_average:.2f}%")
-    losers = sorted(daily_changes, key=daily_changes.get)[:5]
+    losers = heapq.nsmallest(5, daily_changes, key=daily_changes.get)
  
     print(losers)
     rank = 1
@@ -158,8 +162,12 @@ def analyze_results(df_results, sd, ed):
     
 
     # Trend Analysis: Day of the Week
-    df_results['day_of_week'] = df_results['date'].dt.day_name()
-    day_of_week_trends = df_results.groupby('day_of_week')['return_2y'].mean()
+    # Categorical built straight from the weekday codes: groupby runs on the
+    # int codes instead of hashing a day-name string per row
+    df_results['day_of_week'] = pd.Categorical.from_codes(
+        df_results['date'].dt.dayofweek, categories=list(calendar.day_name)
+    )
+    day_of_week_trends = df_results.groupby('day_of_week', observed=True)['return_2y'].mean()
     
     print("Day of the Week Trends:", day_of_week_trends)
 
@@ -169,19 +177,17 @@ def analyze_results(df_results, sd, ed):
     try:
         spy = yf.Ticker("SPY")
         spy_data = spy.history(start=sd, end=ed)  # Use the same time window
-        spy_data['2y_return'] = None  # Initialize column
-
-        # Calculate 2-year returns for each day
-        for i in range(len(spy_data)):
-            start_price = spy_data['Close'].iloc[i]
-            start_date = spy_data.index[i]
-            end_date = start_date + timedelta(days=365*2)
-
-            # Find the closest available date within the 2-year window
-            end_prices = spy_data[spy_data.index >= end_date]['Close']
-            if not end_prices.empty:
-                end_price = end_prices.iloc[0]
-                spy_data.at[start_date, '2y_return'] = (end_price - start_price) / start_price * 100
+        # Calculate 2-year returns for each day: locate every window's end
+        # (first trading day on or after start + 2 years) with one searchsorted
+        idx_ns = spy_data.index.values.astype('datetime64[ns]')
+        end_pos = np.searchsorted(idx_ns, idx_ns + np.timedelta64(365*2, 'D'), side='left')
+        valid = end_pos < len(idx_ns)
+
+        close = spy_data['Close'].to_numpy(dtype=np.float64)
+        out = np.full(len(idx_ns), np.nan, dtype=np.float64)
+        out[valid] = (close[end_pos[valid]] - close[valid]) / close[valid] * 100
+
+        spy_data['2y_return'] = out
 
         # Filter out any days without a valid 2-year return
         valid_returns = spy_data['2y_return'].dropna()
@@ -1,12 +1,14 @@
+import numpy as np
 import yfinance as yf
 import pandas as pd
-from analysis import get_biggest_losers, calculate_return, analyze_results
+from analysis import build_price_panel, get_biggest_losers, calculate_returns, analyze_results, get_spy_history
 from datetime import timedelta
 from tqdm import tqdm
 from datetime import datetime
 import pytz  # Import for timezone handling
 from gsheets_helper import upload_df_to_sheets
 import time
+from concurrent.futures import ProcessPoolExecutor
 
 # Set the precise time window
 #end_date = datetime.now() - timedelta(days=365*2)
@@ -21,6 +23,45 @@ end_date = ny_tz.localize(end_date.replace(hour=0, minute=0, second=0, microseco
 start_date = ny_tz.localize(start_date.replace(hour=0, minute=0, second=0, microsecond=0))
 
 
+# Read-only state for process_date, set once per worker by _init_worker
+_panel = None
+_spy_data = None
+
+
+def _init_worker(panel, spy_data):
+    global _panel, _spy_data
+    _panel = panel
+    _spy_data = spy_data
+
+
+def process_date(date):
+    """Return the selected losers (one row each) for a single analysis date."""
+    rows = []
+
+    spy_daily_change = None
+    if date in _spy_data.index:
+        spy_open  = _spy_data.loc[date, 'Open']
+        spy_close = _spy_data.loc[date, 'Close']
+        spy_daily_change = (spy_close - spy_open) / spy_open * 100
+
+    losers, changePercentage = get_biggest_losers(_panel, date)
+
+    for loser in losers:
+        #loser daily change
+        loser_open, loser_close = _panel['prices'][
+            _panel['dates'].get_loc(date), _panel['symbol_ids'][loser]
+        ]
+        loser_daily_change = (loser_close - loser_open) / loser_open * 100
+
+        rows.append({
+            'date': date,
+            'loser': loser,
+            'loser_daily_change': loser_daily_change,
+            'spy_daily_change': spy_daily_change,
+        })
+    return rows
+
+
 def main():
     
     #Will update the SANDP symbols over time as the list changes 
@@ -42,8 +83,10 @@ def main():
             print(f"Error fetching data for {symbol}: {e}")
 
     # get SPY data for the same window
-    spy = yf.Ticker("SPY")
-    spy_data = spy.history(start=start_date, end=end_date)      
+    spy_data = get_spy_history(start_date, end_date)
+
+    # Pack every symbol's Open/Close onto one date axis for the per-day loser scan
+    panel = build_price_panel(data)
 
     # Step 2: Analyze each day and store the results
     results = []
@@ -57,39 +100,21 @@ def main():
 # Ensure frequency is set to None (by converting to a list and back to DatetimeIndex)
     analysis_dates = pd.DatetimeIndex(analysis_dates.tolist(), name="Date")
 
-    # Loop over the analysis dates
-    for date in analysis_dates:
-
-
-        spy_daily_change = None
-        if date in spy_data.index:
-            spy_open  = spy_data.loc[date, 'Open']
-            spy_close = spy_data.loc[date, 'Close']
-            spy_daily_change = (spy_close - spy_open) / spy_open * 100
-
-
-
-        losers, changePercentage = get_biggest_losers(data, date)
-
-        for loser in losers:
-            return_2y = calculate_return(data, loser, date, changePercentage)
-            if return_2y is not None:
-                #loser daily change
-                loser_open  = data[loser].loc[date, 'Open']
-                loser_close = data[loser].loc[date, 'Close']
-                loser_daily_change = (loser_close - loser_open) / loser_open * 100
-                        
-
-                results.append({
-                    'date': date,
-                    'loser': loser,
-                    'loser_daily_change': loser_daily_change,
-                    'return_2y': return_2y,
-                    'spy_daily_change': spy_daily_change,
-                })
+    # Each date is independent once the panel is built, so fan the dates out
+    # across worker processes; the panel is handed to each worker only once
+    with ProcessPoolExecutor(initializer=_init_worker, initargs=(panel, spy_data)) as pool:
+        for rows in pool.map(process_date, analysis_dates, chunksize=64):
+            results.extend(rows)
     
+    # Holding-period returns in one batched lookup per symbol rather than one
+    # nearest-date search per (symbol, date); picks without a return are dropped
+    df_results = pd.DataFrame(results, columns=['date', 'loser', 'loser_daily_change', 'spy_daily_change'])
+    df_results.insert(3, 'return_2y', np.nan)
+    for loser, picks in df_results.groupby('loser'):
+        df_results.loc[picks.index, 'return_2y'] = calculate_returns(panel, loser, picks['date'])
+    df_results = df_results[df_results['return_2y'].notna()].reset_index(drop=True)
+
     # Step 3: Analyze results
-    df_results = pd.DataFrame(results)
     analyze_results(df_results, start_date, end_date)
 
     # Convert 'date' column to a standard YYYY-MM-DD string format